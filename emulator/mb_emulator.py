@@ -0,0 +1,169 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# micro:bit emulator: runs microbit_app.py on the host against the simulated
+# MicroPython modules in the sim folder and connects it to a pseudo terminal,
+# so that remote:bit scripts can use it as if it was a micro:bit on a serial port.
+#
+# Usage:
+#   python3 mb_emulator.py [--link /tmp/microbit] [--baud 115200] [--latency 0]
+#                          [--command-latency pin.read_analog=5 ...] [--v1] [--app PATH]
+#
+# then run the remote:bit scripts with REMOTEBIT_SERIAL=/tmp/microbit,
+# kill -USR1 <emulator pid> resets the emulated micro:bit.
+
+import argparse
+import importlib.util
+import os
+import pty
+import select
+import signal
+import sys
+import time
+import tty
+
+_dir = os.path.dirname(os.path.abspath(__file__))
+_sim_dir = os.path.join(_dir, 'sim')
+
+
+class Reset(BaseException):
+    # not caught by the application handling its exceptions
+    pass
+
+
+def _on_reset(signum, frame):
+    raise Reset()
+
+
+class PtyConsole:
+    """
+    stdin and stdout of the emulated micro:bit: echoes the received lines
+    like MicroPython input() does and limits the speed to the given baud rate.
+    """
+    def __init__(self, fd: int, baud: int, latency_ms: float, command_latency_ms: dict):
+        self.fd = fd
+        # 10 bits per byte: start, 8 data bits, stop
+        self.byte_seconds = 10 / baud if baud else 0
+        self.latency_ms = latency_ms
+        self.command_latency_ms = command_latency_ms
+        self.buffer = b''
+
+    def _fill(self, timeout) -> None:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            self.buffer += os.read(self.fd, 4096)
+
+    def any(self) -> int:
+        self._fill(0)
+        return len(self.buffer)
+
+    def readline(self) -> str:
+        while b'\r' not in self.buffer and b'\n' not in self.buffer:
+            self._fill(None)
+        end = min([i for i in (self.buffer.find(b'\r'), self.buffer.find(b'\n')) if i >= 0])
+        line = self.buffer[:end]
+        self.buffer = self.buffer[end + 1:]
+        if self.buffer.startswith(b'\n'):
+            self.buffer = self.buffer[1:]
+        if self.byte_seconds:
+            time.sleep((len(line) + 2) * self.byte_seconds)
+        line = line.decode()
+        self.write(line + '\n')
+
+        latency_ms = self.command_latency_ms.get(line.partition(' ')[0], self.latency_ms)
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        return line + '\n'
+
+    def write(self, s: str) -> int:
+        data = s.replace('\n', '\r\n').encode()
+        if self.byte_seconds:
+            time.sleep(len(data) * self.byte_seconds)
+        os.write(self.fd, data)
+        return len(s)
+
+    def flush(self) -> None:
+        pass
+
+
+def load_app(path: str, v1: bool) -> str:
+    with open(path) as f:
+        source = f.read()
+    if v1:
+        # the same as flash_to_mb_v1.sh: sed '/mbv2_begin/,/mbv2_end/d'
+        lines = []
+        skip = False
+        for line in source.splitlines(keepends=True):
+            if 'mbv2_begin' in line:
+                skip = True
+            if not skip:
+                lines.append(line)
+            if 'mbv2_end' in line:
+                skip = False
+        source = ''.join(lines)
+    return source
+
+
+def main():
+    parser = argparse.ArgumentParser(description='remote:bit micro:bit emulator')
+    parser.add_argument('--app', default=os.path.join(_dir, '..', 'microbit_app', 'microbit_app.py'),
+            help='micro:bit application to run')
+    parser.add_argument('--link', help='symbolic link to create to the pseudo terminal')
+    parser.add_argument('--baud', type=int, default=115200, help='emulated baud rate, 0 - unlimited')
+    parser.add_argument('--latency', type=float, default=0, help='extra latency per command, ms')
+    parser.add_argument('--command-latency', action='append', default=[], metavar='COMMAND=MS',
+            help='extra latency of the given command, ms')
+    parser.add_argument('--v1', action='store_true', help='run the micro:bit v1 subset of the application')
+    args = parser.parse_args()
+
+    command_latency_ms = {}
+    for cl in args.command_latency:
+        command, _, ms = cl.partition('=')
+        command_latency_ms[command] = float(ms)
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    # the slave end is kept open, so that the host can reconnect
+    slave_path = os.ttyname(slave)
+    if args.link:
+        if os.path.lexists(args.link):
+            os.remove(args.link)
+        os.symlink(slave_path, args.link)
+    print(f'remote:bit emulator: {args.link or slave_path}', file=sys.stderr, flush=True)
+
+    source = load_app(args.app, args.v1)
+    sys.path.insert(0, _sim_dir)
+    console = PtyConsole(master, args.baud, args.latency, command_latency_ms)
+    sys.stdin = console
+    sys.stdout = console
+    signal.signal(signal.SIGUSR1, _on_reset)
+    try:
+        while True:
+            # the builtin gc module is found before the sim folder
+            spec = importlib.util.spec_from_file_location('gc', os.path.join(_sim_dir, 'gc.py'))
+            gc = sys.modules['gc'] = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(gc)
+            if args.v1:
+                gc.heap_size = 10240
+            try:
+                exec(compile(source, args.app, 'exec'), {'__name__': '__main__'})
+                break
+            except Reset:
+                # the simulated modules start over, the data being received is lost
+                console.buffer = b''
+                for name in [n for n, m in sys.modules.items()
+                        if (getattr(m, '__file__', None) or '').startswith(_sim_dir)]:
+                    del sys.modules[name]
+                print('remote:bit emulator: reset', file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.link and os.path.islink(args.link):
+            os.remove(args.link)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Simulated MicroPython gc module for the remote:bit emulator,
+# a quarter of the heap is in use, the size of the micro:bit v2 heap by default.
+
+heap_size = 65536
+
+
+def collect() -> None:
+    pass
+
+
+def mem_alloc() -> int:
+    return heap_size // 4
+
+
+def mem_free() -> int:
+    return heap_size - mem_alloc()
@@ -0,0 +1,362 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Simulated MicroPython microbit module for the remote:bit emulator,
+# it keeps just enough state to make the requests behave consistently,
+# e.g. display.get_pixel returns what display.set_pixel has written.
+
+import sys as _sys
+import time as _time
+
+_start = _time.monotonic()
+
+
+def sleep(ms: int) -> None:
+    _time.sleep(ms / 1000)
+
+
+def running_time() -> int:
+    return int((_time.monotonic() - _start) * 1000)
+
+
+def temperature() -> int:
+    return 21
+
+
+class MicroBitPin:
+    def __init__(self, analog: bool = False, touch: bool = False):
+        self.analog = analog
+        self.touch = touch
+        self.digital_value = 0
+        self.analog_value = 0
+        self.touched = False
+        self.analog_period_us = 20000
+
+    def read_digital(self) -> int:
+        return self.digital_value
+
+    def write_digital(self, value: int) -> None:
+        self.digital_value = 1 if value else 0
+        self.analog_value = 1023 if value else 0
+
+    def read_analog(self) -> int:
+        if not self.analog:
+            raise ValueError('Pin does not have analog capability')
+        return self.analog_value
+
+    def write_analog(self, value: int) -> None:
+        if not(0 <= value <= 1023):
+            raise ValueError('value must be between 0 and 1023')
+        self.analog_value = value
+        self.digital_value = 1 if value >= 512 else 0
+
+    def set_analog_period(self, period: int) -> None:
+        self.analog_period_us = period * 1000
+
+    def set_analog_period_microseconds(self, period: int) -> None:
+        self.analog_period_us = period
+
+    def is_touched(self) -> bool:
+        if not self.touch:
+            raise ValueError('Pin does not have touch capability')
+        return self.touched
+
+
+pin0 = MicroBitPin(analog=True, touch=True)
+pin1 = MicroBitPin(analog=True, touch=True)
+pin2 = MicroBitPin(analog=True, touch=True)
+pin3 = MicroBitPin(analog=True)
+pin4 = MicroBitPin(analog=True)
+pin5 = MicroBitPin()
+pin6 = MicroBitPin()
+pin7 = MicroBitPin()
+pin8 = MicroBitPin()
+pin9 = MicroBitPin()
+pin10 = MicroBitPin(analog=True)
+pin11 = MicroBitPin()
+pin12 = MicroBitPin()
+pin13 = MicroBitPin()
+pin14 = MicroBitPin()
+pin15 = MicroBitPin()
+pin16 = MicroBitPin()
+pin19 = MicroBitPin()
+pin20 = MicroBitPin()
+pin_logo = MicroBitPin(touch=True)
+pin_speaker = MicroBitPin()
+
+
+class Button:
+    def __init__(self):
+        self.pressed = False
+        self.presses = 0
+        self.was = False
+
+    def press(self) -> None:
+        """Simulates pressing the button."""
+        self.pressed = True
+        self.presses += 1
+        self.was = True
+
+    def release(self) -> None:
+        """Simulates releasing the button."""
+        self.pressed = False
+
+    def is_pressed(self) -> bool:
+        return self.pressed
+
+    def was_pressed(self) -> bool:
+        was, self.was = self.was, False
+        return was
+
+    def get_presses(self) -> int:
+        presses, self.presses = self.presses, 0
+        return presses
+
+
+button_a = Button()
+button_b = Button()
+
+
+class Image:
+    def __init__(self, *args):
+        if len(args) == 0:
+            self.rows = [[0] * 5 for y in range(5)]
+        elif len(args) == 1 and isinstance(args[0], str) and len(args[0]) == 1:
+            # the glyph of a character, the font is not simulated, only the blank space
+            self.rows = [[0] * 5 for y in range(5)]
+            self.rows[2][2] = 0 if args[0] == ' ' else 9
+        elif len(args) == 1 and isinstance(args[0], str):
+            separator = '\n' if '\n' in args[0] else ':'
+            self.rows = [[int(p) for p in row] for row in args[0].split(separator) if row]
+        elif len(args) == 2:
+            self.rows = [[0] * args[0] for y in range(args[1])]
+        else:
+            width, height, buffer = args
+            self.rows = [list(buffer[y * width:(y + 1) * width]) for y in range(height)]
+
+    def width(self) -> int:
+        return len(self.rows[0]) if self.rows else 0
+
+    def height(self) -> int:
+        return len(self.rows)
+
+    def get_pixel(self, x: int, y: int) -> int:
+        return self.rows[y][x]
+
+    def set_pixel(self, x: int, y: int, value: int) -> None:
+        self.rows[y][x] = value
+
+
+class Display:
+    def __init__(self):
+        self.pixels = [[0] * 5 for y in range(5)]
+        self.lit = True
+        self.text = ''
+
+    def clear(self) -> None:
+        self.pixels = [[0] * 5 for y in range(5)]
+
+    def set_pixel(self, x: int, y: int, value: int) -> None:
+        if not(0 <= value <= 9):
+            raise ValueError('brightness out of bounds')
+        self.pixels[y][x] = value
+
+    def get_pixel(self, x: int, y: int) -> int:
+        return self.pixels[y][x]
+
+    def show(self, image, delay: int = 400, *, wait: bool = True, loop: bool = False, clear: bool = False) -> None:
+        if isinstance(image, Image):
+            for y in range(min(image.height(), 5)):
+                for x in range(min(image.width(), 5)):
+                    self.pixels[y][x] = image.get_pixel(x, y)
+        elif isinstance(image, list):
+            for frame in image:
+                self.show(frame)
+            if wait:
+                _time.sleep(delay * len(image) / 1000)
+        else:
+            self.text = str(image)
+            if wait:
+                _time.sleep(delay * len(self.text) / 1000)
+        if clear:
+            self.clear()
+
+    def scroll(self, text, delay: int = 150, *, wait: bool = True, loop: bool = False, monospace: bool = False) -> None:
+        self.text = str(text)
+        if wait:
+            # ~5 columns per character
+            _time.sleep(delay * 5 * (len(self.text) + 1) / 1000)
+
+    def on(self) -> None:
+        self.lit = True
+
+    def off(self) -> None:
+        self.lit = False
+
+    def is_on(self) -> bool:
+        return self.lit
+
+    def read_light_level(self) -> int:
+        return 128
+
+
+display = Display()
+
+
+class Accelerometer:
+    def __init__(self):
+        self.values = (0, 0, -1024)
+        self.gesture = 'face up'
+        self.gestures = []
+
+    def get_x(self) -> int:
+        return self.values[0]
+
+    def get_y(self) -> int:
+        return self.values[1]
+
+    def get_z(self) -> int:
+        return self.values[2]
+
+    def get_values(self):
+        return self.values
+
+    def set_gesture(self, name: str) -> None:
+        """Simulates a gesture."""
+        self.gesture = name
+        self.gestures.append(name)
+
+    def current_gesture(self) -> str:
+        return self.gesture
+
+    def is_gesture(self, name: str) -> bool:
+        return self.gesture == name
+
+    def was_gesture(self, name: str) -> bool:
+        was = name in self.gestures
+        self.gestures = []
+        return was
+
+    def get_gestures(self):
+        gestures = tuple(self.gestures)
+        self.gestures = []
+        return gestures
+
+
+accelerometer = Accelerometer()
+
+
+class Compass:
+    def __init__(self):
+        self.calibrated = True
+        self.values = (10, 20, 30)
+
+    def calibrate(self) -> None:
+        self.calibrated = True
+
+    def is_calibrated(self) -> bool:
+        return self.calibrated
+
+    def clear_calibration(self) -> None:
+        self.calibrated = False
+
+    def get_x(self) -> int:
+        return self.values[0]
+
+    def get_y(self) -> int:
+        return self.values[1]
+
+    def get_z(self) -> int:
+        return self.values[2]
+
+    def heading(self) -> int:
+        return 0
+
+    def get_field_strength(self) -> int:
+        return 50000
+
+
+compass = Compass()
+
+
+class I2C:
+    def __init__(self):
+        # address -> register contents, the accelerometer and the magnetometer
+        self.devices = {0x19: bytearray(64), 0x1e: bytearray(64)}
+
+    def init(self, freq: int = 100000, sda=pin20, scl=pin19) -> None:
+        pass
+
+    def scan(self):
+        return sorted(self.devices)
+
+    def read(self, addr: int, n: int, repeat: bool = False) -> bytes:
+        if addr not in self.devices:
+            raise OSError(19)
+        return bytes(self.devices[addr][:n])
+
+    def write(self, addr: int, buf: bytes, repeat: bool = False) -> None:
+        if addr not in self.devices:
+            raise OSError(19)
+
+
+i2c = I2C()
+
+
+class SPI:
+    """Loopback: MISO is connected to MOSI."""
+    def init(self, baudrate: int = 1000000, bits: int = 8, mode: int = 0,
+            sclk=pin13, mosi=pin15, miso=pin14) -> None:
+        pass
+
+    def read(self, nbytes: int, sendbyte: int = 0) -> bytes:
+        return bytes([sendbyte] * nbytes)
+
+    def write(self, buffer: bytes) -> None:
+        pass
+
+    def write_readinto(self, out, in_buf) -> None:
+        in_buf[:] = out
+
+
+spi = SPI()
+
+
+class Speaker:
+    def __init__(self):
+        self.enabled = True
+
+    def on(self) -> None:
+        self.enabled = True
+
+    def off(self) -> None:
+        self.enabled = False
+
+    def is_on(self) -> bool:
+        return self.enabled
+
+
+speaker = Speaker()
+
+
+class Microphone:
+    def sound_level(self) -> int:
+        return 0
+
+
+microphone = Microphone()
+
+
+class UART:
+    def any(self) -> int:
+        waiting = _sys.stdin.any() if hasattr(_sys.stdin, 'any') else 0
+        if not waiting:
+            # polling the events, do not keep the host CPU busy
+            _time.sleep(0.001)
+        return waiting
+
+
+uart = UART()
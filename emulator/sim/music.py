@@ -0,0 +1,80 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Simulated MicroPython music module for the remote:bit emulator,
+# blocking calls take the time the melody would play.
+# The built-in melodies are shortened, only their names matter here.
+
+from microbit import pin0, sleep
+
+_ticks = 4
+_bpm = 120
+_duration = 4
+
+
+def set_tempo(ticks: int = 4, bpm: int = 120) -> None:
+    global _ticks, _bpm
+    _ticks = ticks
+    _bpm = bpm
+
+
+def get_tempo():
+    return _ticks, _bpm
+
+
+def _note_ticks(note: str) -> int:
+    global _duration
+    _, _, duration = note.partition(':')
+    if duration:
+        _duration = int(duration)
+    return _duration
+
+
+def play(music, pin=pin0, wait: bool = True, loop: bool = False) -> None:
+    if isinstance(music, str):
+        music = [music]
+    ticks = sum([_note_ticks(note) for note in music])
+    if wait:
+        sleep(ticks * 60000 // (_bpm * _ticks))
+
+
+def pitch(frequency: int, duration: int = -1, pin=pin0, wait: bool = True) -> None:
+    if wait and duration > 0:
+        sleep(duration)
+
+
+def stop(pin=pin0) -> None:
+    pass
+
+
+def reset() -> None:
+    global _ticks, _bpm, _duration
+    _ticks = 4
+    _bpm = 120
+    _duration = 4
+
+
+DADADADUM = ['r4:2', 'g', 'g', 'g', 'eb:8', 'r:2', 'f', 'f', 'f', 'd:8']
+ENTERTAINER = ['d4:1', 'd#', 'e', 'c5:2', 'e4:1', 'c5:2', 'e4:1', 'c5:3']
+PRELUDE = ['c4:1', 'e', 'g', 'c5', 'e', 'g4', 'c5', 'e']
+ODE = ['e4', 'e', 'f', 'g', 'g', 'f', 'e', 'd', 'c', 'c', 'd', 'e', 'e:6', 'd:2', 'd:8']
+NYAN = ['f#5:2', 'g#', 'c#:1', 'd#:2', 'b4:1', 'd5:1', 'c#', 'b4:2']
+RINGTONE = ['c4:1', 'd', 'e:2', 'g', 'd:1', 'e', 'f:2', 'a', 'e:1', 'f', 'g:2', 'b', 'c5:4']
+FUNK = ['c2:2', 'c', 'd#', 'c:1', 'f:2', 'c:1', 'f:2', 'f#', 'g']
+BLUES = ['c2:2', 'e', 'g', 'a', 'a#', 'a', 'g', 'e']
+BIRTHDAY = ['c4:3', 'c:1', 'd:4', 'c:4', 'f', 'e:8']
+WEDDING = ['c4:4', 'f:3', 'f:1', 'f:8', 'c:4', 'g:3', 'e:1', 'f:8']
+FUNERAL = ['c3:4', 'c:3', 'c:1', 'c:4', 'd#:3', 'd:1', 'd:3', 'c:1', 'c:3', 'b2:1', 'c3:4']
+PUNCHLINE = ['c4:3', 'g3:1', 'f#', 'g', 'g#:3', 'g', 'r', 'b', 'c4']
+PYTHON = ['d5:1', 'b4', 'r', 'b', 'b', 'a#', 'b', 'g5', 'r', 'd']
+BADDY = ['c3:3', 'r', 'd:2', 'd#', 'r', 'c', 'r', 'f#:8']
+CHASE = ['a4:1', 'b', 'c5', 'b4', 'a:2', 'r', 'a:1', 'b', 'c5', 'b4', 'a:2']
+BA_DING = ['b5:1', 'e6:3']
+WAWAWAWAA = ['e3:3', 'r:1', 'd#:3', 'r:1', 'd:4', 'r:1', 'c#:8']
+JUMP_UP = ['c5:1', 'd', 'e', 'f', 'g']
+JUMP_DOWN = ['g5:1', 'f', 'e', 'd', 'c']
+POWER_UP = ['g4:1', 'c5', 'e', 'g:2', 'e:1', 'g:3']
+POWER_DOWN = ['g5:1', 'd#', 'c', 'g4:2', 'b:1', 'c5:3']
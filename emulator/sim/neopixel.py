@@ -0,0 +1,38 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Simulated MicroPython neopixel module for the remote:bit emulator.
+
+
+class NeoPixel:
+    def __init__(self, pin, n: int, bpp: int = 3):
+        self.pin = pin
+        self.n = n
+        self.bpp = bpp
+        self.buf = bytearray(n * bpp)
+        self.shown = bytes(self.buf)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __setitem__(self, index: int, colour) -> None:
+        self.buf[index * self.bpp:(index + 1) * self.bpp] = bytes(colour)
+
+    def __getitem__(self, index: int):
+        return tuple(self.buf[index * self.bpp:(index + 1) * self.bpp])
+
+    def fill(self, colour) -> None:
+        self.buf[:] = bytes(colour) * self.n
+
+    def clear(self) -> None:
+        self.buf[:] = bytes(len(self.buf))
+        self.show()
+
+    def show(self) -> None:
+        self.shown = bytes(self.buf)
+
+    def write(self) -> None:
+        self.show()
@@ -0,0 +1,58 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Simulated MicroPython radio module for the remote:bit emulator,
+# the sent messages are received back, as if another micro:bit echoed them.
+
+_enabled = False
+_queue = []
+_queue_length = 3
+
+
+def on() -> None:
+    global _enabled
+    _enabled = True
+
+
+def off() -> None:
+    global _enabled
+    _enabled = False
+
+
+def config(**kwargs) -> None:
+    global _queue_length
+    _queue_length = kwargs.get('queue', _queue_length)
+
+
+def reset() -> None:
+    global _queue_length
+    _queue_length = 3
+    _queue.clear()
+
+
+def _check_enabled() -> None:
+    if not _enabled:
+        raise ValueError('radio is not enabled')
+
+
+def send_bytes(message: bytes) -> None:
+    _check_enabled()
+    if len(_queue) < _queue_length:
+        _queue.append(bytes(message))
+
+
+def receive_bytes():
+    _check_enabled()
+    return _queue.pop(0) if _queue else None
+
+
+def send(message: str) -> None:
+    send_bytes(message.encode())
+
+
+def receive():
+    message = receive_bytes()
+    return message.decode() if message else None
@@ -0,0 +1,29 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Simulated MicroPython speech module for the remote:bit emulator,
+# the "phonemes" are just the upper case words.
+
+from microbit import sleep
+
+# ~ the time to speak a phoneme character
+_ms_per_char = 60
+
+
+def translate(words: str) -> str:
+    return ' ' + words.upper()
+
+
+def pronounce(phonemes: str, *, pitch: int = 64, speed: int = 72, mouth: int = 128, throat: int = 128) -> None:
+    sleep(_ms_per_char * len(phonemes) * 72 // max(speed, 1))
+
+
+def say(words: str, *, pitch: int = 64, speed: int = 72, mouth: int = 128, throat: int = 128) -> None:
+    pronounce(translate(words), pitch=pitch, speed=speed, mouth=mouth, throat=throat)
+
+
+def sing(phonemes: str, *, pitch: int = 64, speed: int = 72, mouth: int = 128, throat: int = 128) -> None:
+    pronounce(phonemes, pitch=pitch, speed=speed, mouth=mouth, throat=throat)
@@ -0,0 +1,41 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Simulated MicroPython utime module for the remote:bit emulator,
+# the ticks wrap around like on the micro:bit.
+
+import time as _time
+
+_TICKS_PERIOD = 1 << 30
+_start = _time.monotonic()
+
+
+def sleep(seconds: float) -> None:
+    _time.sleep(seconds)
+
+
+def sleep_ms(ms: int) -> None:
+    _time.sleep(ms / 1000)
+
+
+def sleep_us(us: int) -> None:
+    _time.sleep(us / 1000000)
+
+
+def ticks_ms() -> int:
+    return int((_time.monotonic() - _start) * 1000) % _TICKS_PERIOD
+
+
+def ticks_us() -> int:
+    return int((_time.monotonic() - _start) * 1000000) % _TICKS_PERIOD
+
+
+def ticks_add(ticks: int, delta: int) -> int:
+    return (ticks + delta) % _TICKS_PERIOD
+
+
+def ticks_diff(ticks1: int, ticks2: int) -> int:
+    return (ticks1 - ticks2 + _TICKS_PERIOD // 2) % _TICKS_PERIOD - _TICKS_PERIOD // 2
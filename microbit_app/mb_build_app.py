@@ -0,0 +1,342 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Generates a micro:bit application handling only the requests a host script
+# may send, leaving more micro:bit memory to the script and making the dispatch
+# faster: the remote:bit modules the script imports are scanned for the requests
+# the functions and methods it uses send.
+#
+# Usage:
+#   python3 mb_build_app.py my_script.py [--v1] [--output microbit_my_script_app.py]
+#
+# The host checks the requests against the manifest of the application
+# at the handshake, the requests not handled by it report an error instead of
+# waiting for the micro:bit.
+
+import argparse
+import ast
+import os
+import re
+import sys
+import zlib
+from collections import Counter
+
+_dir = os.path.dirname(os.path.abspath(__file__))
+_lib_dir = os.path.join(_dir, '..', 'remotebit')
+
+# the requests of the serial link itself, dispatched last
+_LINK_COMMANDS = ('sync', 'hello', 'manifest', 'timing', 'telemetry')
+
+# the state enabling an idle loop step of the application, e.g. run_rules(),
+# and the requests setting it: the steps of the trimmed requests are removed
+_IDLE_STEPS = {
+    'events': ('events',),
+    'animation': ('display.show', 'display.scroll'),
+    'stream_kind': ('stream.start',),
+    'rules': ('rule.add',),
+    'watches': ('watch.start',),
+    'log_sources': ('log.start',),
+}
+
+_branch = re.compile(r"^        (?:el)?if cmd == '([^']+)':\n$")
+
+
+def strip_v2(source: str) -> str:
+    # the same as flash_to_mb_v1.sh: sed '/mbv2_begin/,/mbv2_end/d'
+    lines = []
+    skip = False
+    for line in source.splitlines(keepends=True):
+        if 'mbv2_begin' in line:
+            skip = True
+        if not skip:
+            lines.append(line)
+        if 'mbv2_end' in line:
+            skip = False
+    return ''.join(lines)
+
+
+def split_app(source: str):
+    """
+    Splits the application into the code before the dispatch, the dispatch
+    branches as (command, lines) and the code after the dispatch.
+    """
+    lines = [line for line in source.splitlines(keepends=True) if line.strip() not in ('# mbv2_begin', '# mbv2_end')]
+    first = next(i for i, line in enumerate(lines) if line.startswith("        if cmd == '"))
+    last = lines.index('        elif quiet:\n')
+    branches = []
+    for line in lines[first:last]:
+        match = _branch.match(line)
+        if match:
+            branches.append((match.group(1), []))
+        branches[-1][1].append(line)
+    return lines[:first], branches, lines[last:]
+
+
+def _requested_commands(node: ast.AST, commands: set) -> set:
+    # the string constants and f-strings starting with a micro:bit request, e.g. f'display.show {...}'
+    found = set()
+    for n in ast.walk(node):
+        if isinstance(n, ast.Constant) and isinstance(n.value, str):
+            text = n.value
+        elif isinstance(n, ast.JoinedStr) and n.values and isinstance(n.values[0], ast.Constant):
+            text = n.values[0].value
+        else:
+            continue
+        command = re.split(r'[ {]', text, 1)[0]
+        if command in commands:
+            found.add(command)
+    return found
+
+
+class Index:
+    """
+    The requests sent by the functions and methods of the remote:bit modules,
+    and the functions and methods they call. Module functions are named
+    'module.function', methods 'Class.method', module level code 'module'.
+    The calls are resolved by the names of the modules, the classes and
+    the variables assigned an instance of a class, the calls on other objects
+    are ignored, except in the script, where they may be any method of that name.
+    """
+    SCRIPT = '__script__'
+
+    def __init__(self, commands: set):
+        self.commands = commands
+        # name -> (node, module, class)
+        self.code = {}
+        self.classes = set()
+        # variable -> class names
+        self.instances = {}
+        # module -> {name or alias -> imported module}, modules imported with *
+        self.imports = {}
+        self.star_imports = {}
+        self.calls = {}
+
+    def add_module(self, module: str, tree: ast.Module) -> None:
+        imports = self.imports[module] = {}
+        star_imports = self.star_imports[module] = []
+        module_code = []
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.code[f'{module}.{node.name}'] = (node, module, None)
+            elif isinstance(node, ast.ClassDef):
+                self.classes.add(node.name)
+                for item in node.body:
+                    if isinstance(item, ast.FunctionDef):
+                        self.code[f'{node.name}.{item.name}'] = (item, module, node.name)
+            else:
+                module_code.append(node)
+        self.code[module] = (ast.Module(body=module_code, type_ignores=[]), module, None)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    imports[alias.asname or alias.name] = alias.name
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                star_imports.append(node.module)
+
+    def _add_instances(self) -> None:
+        for node, _, _ in self.code.values():
+            for n in ast.walk(node):
+                if isinstance(n, ast.Assign) and isinstance(n.value, ast.Call):
+                    # e.g. x = Class() or x = module.Class()
+                    func = n.value.func
+                    cls = func.id if isinstance(func, ast.Name) else getattr(func, 'attr', None)
+                    if cls not in self.classes:
+                        continue
+                    for target in n.targets:
+                        if isinstance(target, ast.Name):
+                            self.instances.setdefault(target.id, set()).add(cls)
+
+    def _resolve_name(self, name: str, module: str) -> list:
+        for m in [module] + self.star_imports.get(module, []):
+            if f'{m}.{name}' in self.code:
+                return [f'{m}.{name}']
+        if name in self.classes:
+            return [f'{name}.__init__']
+        return []
+
+    def _resolve_attribute(self, node: ast.Attribute, module: str, cls: str) -> list:
+        receiver = node.value
+        if isinstance(receiver, ast.Call) and isinstance(receiver.func, ast.Name) and \
+                receiver.func.id == 'get_mb_link':
+            classes = self.instances.get('_mb_link', ())
+        elif not isinstance(receiver, ast.Name):
+            classes = ()
+        elif receiver.id == 'self' and cls:
+            classes = (cls,)
+        elif receiver.id in self.imports.get(module, {}):
+            if node.attr in self.classes:
+                return [f'{node.attr}.__init__']
+            return [f'{self.imports[module][receiver.id]}.{node.attr}']
+        else:
+            classes = self.instances.get(receiver.id, ())
+        if not classes and module == self.SCRIPT:
+            classes = self.classes
+        return [f'{c}.{node.attr}' for c in classes]
+
+    def _calls(self, name: str) -> set:
+        if name not in self.calls:
+            node, module, cls = self.code[name]
+            calls = set()
+            for n in ast.walk(node):
+                if isinstance(n, ast.Name):
+                    calls.update(self._resolve_name(n.id, module))
+                elif isinstance(n, ast.Attribute):
+                    calls.update(self._resolve_attribute(n, module, cls))
+            self.calls[name] = {c for c in calls if c in self.code}
+        return self.calls[name]
+
+    def closure(self, names) -> set:
+        if not self.instances:
+            self._add_instances()
+        seen = set()
+        pending = list(names)
+        commands = set()
+        while pending:
+            name = pending.pop()
+            if name in seen or name not in self.code:
+                continue
+            seen.add(name)
+            # the module level code of the library only defines, e.g. the sets of the request names
+            if name not in self.imports or name == self.SCRIPT:
+                commands |= _requested_commands(self.code[name][0], self.commands)
+            pending.extend(self._calls(name))
+        return commands
+
+
+def scan(script_path: str, commands: set):
+    """
+    Returns the requests the script may send, with the number of the places
+    in the script sending each of them.
+    """
+    with open(script_path) as f:
+        script = ast.parse(f.read(), script_path)
+    index = Index(commands)
+    index.add_module(Index.SCRIPT, script)
+    modules = set()
+    pending = ['microbit'] + list(index.imports[Index.SCRIPT].values()) + index.star_imports[Index.SCRIPT]
+    while pending:
+        name = pending.pop()
+        path = os.path.join(_lib_dir, name + '.py')
+        if name in modules or not os.path.exists(path):
+            continue
+        modules.add(name)
+        with open(path) as f:
+            index.add_module(name, ast.parse(f.read(), path))
+        pending.extend(list(index.imports[name].values()) + index.star_imports[name])
+
+    script_code = [name for name, code in index.code.items() if code[1] == Index.SCRIPT]
+    needed = index.closure(script_code + sorted(modules)) | set(_LINK_COMMANDS)
+    weights = Counter()
+    for name in script_code:
+        for call in index._calls(name):
+            for command in index.closure([call]):
+                weights[command] += 1
+    return needed, weights
+
+
+def _remove_idle_steps(lines: list, commands: set) -> list:
+    # the idle loop steps, e.g. "if rules:" and its body, and the terms of "busy = ..."
+    # for the state no kept request sets
+    unused = [name for name, requests in _IDLE_STEPS.items() if not set(requests) & commands]
+    begin = lines.index('        while True:\n')
+    end = lines.index('        request = input()\n')
+    loop = []
+    skip = None
+    for line in lines[begin:end]:
+        indent = len(line) - len(line.lstrip())
+        if skip is not None and indent > skip:
+            continue
+        skip = None
+        match = re.match(r' *if (\w+)', line)
+        if match and match.group(1) in unused:
+            skip = indent
+            continue
+        match = re.match(r'( *busy = )(.*)\n', line)
+        if match:
+            terms = [t for t in match.group(2).split(' or ') if t not in unused]
+            if terms == ['busy']:
+                continue
+            line = match.group(1) + (' or '.join(terms) or 'False') + '\n'
+        loop.append(line)
+    return lines[:begin] + loop + lines[end:]
+
+
+def _remove_unused_code(lines: list) -> list:
+    # top level functions and variables not used by the rest of the application,
+    # with the comments right above them
+    while True:
+        blocks = []
+        for i, line in enumerate(lines):
+            if line.startswith('def ') or not blocks or not line[:1].isspace() and not line.startswith('#'):
+                blocks.append([i, i + 1])
+            else:
+                blocks[-1][1] = i + 1
+        code = [('' if line.lstrip().startswith('#') else line) for line in lines]
+        text = ''.join(code)
+        unused = None
+        for begin, end in blocks:
+            match = re.match(r'def (\w+)|(\w+) = ', lines[begin])
+            if match:
+                name = match.group(1) or match.group(2)
+                if len(re.findall(r'\b' + name + r'\b', text)) == \
+                        len(re.findall(r'\b' + name + r'\b', ''.join(code[begin:end]))):
+                    unused = (begin, end)
+                    break
+        if unused is None:
+            return lines
+        begin, end = unused
+        while begin > 0 and lines[begin - 1].startswith('#'):
+            begin -= 1
+        del lines[begin:end]
+
+
+def build(source: str, needed: set, weights: Counter) -> str:
+    head, branches, tail = split_app(source)
+    kept = [(command, body) for command, body in branches if command in needed]
+    link = [b for b in kept if b[0] in _LINK_COMMANDS]
+    # the most used requests are matched first
+    order = {command: i for i, (command, _) in enumerate(kept)}
+    kept = sorted([b for b in kept if b[0] not in _LINK_COMMANDS], key=lambda b: (-weights[b[0]], order[b[0]]))
+    commands = [command for command, _ in kept + link] + ['manifest']
+    manifest_id = format(zlib.crc32(' '.join(sorted(commands)).encode()), '08x')
+
+    dispatch = []
+    for command, body in kept + link:
+        if command == 'hello':
+            body = [body[0], f"            print(boot + ' {manifest_id}')\n"]
+        dispatch.append(f"        {'elif' if dispatch else 'if'} cmd == '{command}':\n")
+        dispatch.extend(body[1:])
+    dispatch.append("        elif cmd == 'manifest':\n")
+    dispatch.append(f"            print('{' '.join(commands)}')\n")
+    head = _remove_idle_steps(head, set(commands))
+    return ''.join(_remove_unused_code(head + dispatch + tail))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='builds a micro:bit application for a remote:bit script')
+    parser.add_argument('script', help='host script to build the micro:bit application for')
+    parser.add_argument('--v1', action='store_true', help='build for micro:bit v1')
+    parser.add_argument('--app', default=os.path.join(_dir, 'microbit_app.py'), help='full micro:bit application')
+    parser.add_argument('--output', help='generated application, microbit_<script>_app.py by default')
+    args = parser.parse_args()
+
+    with open(args.app) as f:
+        source = f.read()
+    if args.v1:
+        source = strip_v2(source)
+    commands = {command for command, _ in split_app(source)[1]}
+    needed, weights = scan(args.script, commands)
+    app = build(source, needed, weights)
+
+    output = args.output or f'microbit_{os.path.splitext(os.path.basename(args.script))[0]}_app.py'
+    with open(output, 'w') as f:
+        f.write(app)
+    handled = sorted(needed & commands)
+    print(f'{output}: {len(handled)} of {len(commands)} requests: {" ".join(handled)}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,12 @@
 # https://github.com/voltur01/remotebit
 
 from microbit import *
+from utime import ticks_add, ticks_ms, ticks_us, ticks_diff
+import gc
 import music
+import random
 # mbv2_begin
-import gc
+import neopixel
 import radio
 import speech
 # mbv2_end
@@ -21,16 +24,279 @@ def from_bytes(bts: bytes) -> str:
     return escape(' '.join([str(b) for b in bts]))
 # mbv2_end
 def confirm():
-    print('ok')
+    # unacknowledged requests report only the errors
+    if not quiet:
+        print('ok')
+def play_melody(melody, pin, loop):
+    ticks, bpm = music.get_tempo()
+    while True:
+        for i in range(0, len(melody), 2):
+            ms = melody[i + 1] * 60000 // (bpm * ticks)
+            if melody[i]:
+                music.pitch(melody[i], ms, pin)
+            else:
+                sleep(ms)
+        if not loop:
+            break
+
+def poll_events():
+    for name in buttons:
+        presses = buttons[name].get_presses()
+        pressed = buttons[name].is_pressed()
+        if presses or pressed != last_pressed.get(name, False):
+            last_pressed[name] = pressed
+            print('!button ' + name + ' ' + str(int(pressed)) + ' ' + str(presses))
+# mbv2_begin
+    for gesture in accelerometer.get_gestures():
+        print('!gesture ' + escape(gesture))
+# mbv2_end
+def wait_for(kind, source, arg, timeout):
+    if kind == 'button':
+        condition = buttons[source].is_pressed
+    elif kind == 'digital':
+        condition = lambda: pins[int(source)].read_digital() == arg
+    elif kind == 'above':
+        condition = lambda: pins[int(source)].read_analog() > arg
+    else:
+        condition = lambda: pins[int(source)].read_analog() < arg
+    t_start = ticks_ms()
+    while not condition():
+        if ticks_diff(ticks_ms(), t_start) >= timeout:
+            return ''
+    return str(ticks_us())
+# mbv2_begin
+def rule_condition(p):
+    if p[0] == 'button.is_pressed':
+        return buttons[p[1]].is_pressed
+    if p[0] == 'pin.read_digital':
+        return pins[int(p[1])].read_digital
+    if p[0] == 'pin.read_analog':
+        return pins[int(p[1])].read_analog
+    if p[0] == 'pin.is_touched':
+        return pins[int(p[1])].is_touched
+    if p[0] in ('a.get_x', 'a.get_y', 'a.get_z'):
+        return getattr(accelerometer, p[0][2:])
+    if p[0] in ('compass.get_x', 'compass.get_y', 'compass.get_z', 'compass.heading'):
+        return getattr(compass, p[0][8:])
+    if p[0] == 'microphone.sound_level':
+        return microphone.sound_level
+    raise ValueError('unsupported rule condition ' + p[0])
+def rule_action(p):
+    args = [int(v) for v in p[1:]]
+    if p[0] == '-':
+        return None
+    if p[0] == 'pin.write_digital':
+        return lambda: pins[args[0]].write_digital(args[1])
+    if p[0] == 'pin.write_analog':
+        return lambda: pins[args[0]].write_analog(args[1])
+    if p[0] == 'display.set_pixel':
+        return lambda: display.set_pixel(args[0], args[1], args[2])
+    if p[0] == 'music.pitch':
+        pin = pins[args[2]] if len(args) > 2 else pin0
+        return lambda: music.pitch(args[0], args[1], pin, False)
+    raise ValueError('unsupported rule action ' + p[0])
+def compare(value, op, arg):
+    if op == '<':
+        return value < arg
+    if op == '>':
+        return value > arg
+    if op == '<=':
+        return value <= arg
+    if op == '>=':
+        return value >= arg
+    if op == '!=':
+        return value != arg
+    return value == arg
+def run_rules():
+    for rule in rules.values():
+        if not rule[5]:
+            continue
+        try:
+            state = compare(rule[0](), rule[1], rule[2])
+            if state != rule[6]:
+                if state:
+                    rule[7] += 1
+                elif rule[6] is not None:
+                    rule[8] += 1
+                rule[6] = state
+                action = rule[3] if state else rule[4]
+                if action:
+                    action()
+        except Exception as e:
+            rule[5] = False
+            rule[9] = str(e)
+# mbv2_end
+def end_animation(status):
+    global animation
+    if animation:
+        print('!animation ' + animation + ' ' + status)
+        animation = ''
+def start_animation(wait, loop, id, length):
+    # the notification is sent once the animation of the given length in ms ends,
+    # looped ones are only cancelled
+    global animation, animation_end
+    if not wait:
+        animation = id
+        animation_end = None if loop else ticks_add(ticks_ms(), length)
+def run_stream():
+    # plays the next note of the streamed melody once the previous one ended,
+    # the host gets a credit for every consumed chunk to send the next one
+    global stream_kind, stream_queue, stream_index, stream_note_end
+    try:
+        if ticks_diff(ticks_ms(), stream_note_end) < 0:
+            return
+        if stream_queue and stream_index >= len(stream_queue[0]):
+            stream_queue.pop(0)
+            stream_index = 0
+            print('!stream credit')
+        if not stream_queue:
+            if stream_ended:
+                stream_kind = ''
+                print('!stream done')
+            return
+        chunk = stream_queue[0]
+# mbv2_begin
+        if stream_kind == 'speech':
+            gc.collect()
+            speech.say(chunk, pitch=stream_params[0], speed=stream_params[1], \
+                    mouth=stream_params[2], throat=stream_params[3])
+            stream_index = len(chunk)
+            return
+# mbv2_end
+        ticks, bpm = music.get_tempo()
+        ms = chunk[stream_index + 1] * 60000 // (bpm * ticks)
+        if chunk[stream_index]:
+            music.pitch(chunk[stream_index], ms, stream_params[0], False)
+        else:
+            music.stop(stream_params[0])
+        stream_index += 2
+        stream_note_end = ticks_add(ticks_ms(), ms)
+    except Exception as e:
+        # the stream ends, e.g. out of memory, the host stops waiting for it
+        stream_kind = ''
+        stream_queue = []
+        print('!stream error ' + escape(str(e)))
+# mbv2_begin
+def run_log():
+    # samples the logged sources every log_interval us, skips the samples missed
+    global log_next, log_sources
+    t = ticks_us()
+    if ticks_diff(t, log_next) < 0:
+        return
+    log_next = ticks_add(log_next, log_interval)
+    if ticks_diff(t, log_next) >= 0:
+        log_next = ticks_add(t, log_interval)
+    line = '!log ' + str(t)
+    try:
+        for read in log_sources:
+            line += ' ' + str(int(read()))
+    except Exception as e:
+        # the logging stops, the host reports the error
+        log_sources = []
+        line = '!log error ' + escape(str(e))
+    print(line)
+def run_watches():
+    for n in watches:
+        watch = watches[n]
+        try:
+            value = pins[n].read_digital()
+            if value != watch[0]:
+                t = ticks_us()
+                if watch[1] + watch[2]:
+                    # the previous edge ended a full pulse
+                    watch[5 if value else 4] = ticks_diff(t, watch[3])
+                watch[1 if value else 2] += 1
+                watch[0] = value
+                watch[3] = t
+                if events and watch[6]:
+                    print('!edge ' + str(n) + ' ' + str(value) + ' ' + str(t))
+        except Exception as e:
+            # the failing watch is stopped, the iteration ends with the change
+            del watches[n]
+            print('!watch ' + str(n) + ' error ' + escape(str(e)))
+            return
+# mbv2_end
 
 buttons = { 'A': button_a, 'B': button_b }
 pins = [pin0, pin1, pin2, pin3, pin4, pin5, pin6, pin7, pin8, pin9, pin10,
         pin11, pin12, pin13, pin14, pin15, pin16, None, None, pin19, pin20]
+melodies = {}
+# mbv2_begin
+# id -> [condition, operator, value, action, otherwise action,
+#        enabled, condition state, true count, false count, error]
+rules = {}
+# pin number -> [value, rising count, falling count, last edge ticks_us,
+#                high pulse us, low pulse us, notify, rising count at read, read ticks_us]
+watches = {}
+neopixels = {}
+# sensor logging: source read functions, interval and the next sample ticks_us
+log_sources = []
+log_interval = 0
+log_next = 0
+# mbv2_end
+# streamed playback: 'music' or 'speech', its parameters, queued chunks,
+# the next note in the first chunk, end ticks_ms of the playing note
+# and whether the host sent the last chunk
+STREAM_CREDITS = 2
+stream_kind = ''
+stream_params = []
+stream_queue = []
+stream_index = 0
+stream_note_end = 0
+stream_ended = False
+# tells the host the micro:bit was reset
+boot = str(random.getrandbits(30))
+print('!boot ' + boot)
+timed = False
+quiet = ''
+# id of the running non-blocking display animation and its end ticks_ms
+animation = ''
+animation_end = None
+events = False
+last_pressed = {}
+cmd = ''
+# telemetry: requests processed and exceptions raised
+commands = 0
+exceptions = 0
 while True:
     try:
+        # run the rules and push the events to the host while waiting for the next request
+        while True:
+            try:
+                busy = events or animation or stream_kind
+# mbv2_begin
+                if watches:
+                    run_watches()
+                if rules:
+                    run_rules()
+                if log_sources:
+                    run_log()
+                busy = busy or rules or watches or log_sources
+# mbv2_end
+                if stream_kind:
+                    run_stream()
+                if animation and animation_end is not None and ticks_diff(ticks_ms(), animation_end) >= 0:
+                    end_animation('done')
+                if not busy or uart.any():
+                    break
+                if events:
+                    poll_events()
+            except Exception as e:
+                # no reply is expected: the host gets an event and the events are stopped,
+                # the rest is retried after the next request
+                exceptions += 1
+                events = False
+                print('!fault ' + escape(str(e)))
+                break
         request = input()
+        t_receive = ticks_us()
+        quiet = ''
+        if request.startswith('~'):
+            # ~id request: unacknowledged
+            quiet, request = request[1:].split(' ', 1)
         params = request.split(' ')
         cmd = params[0]
+        commands += 1
         if cmd == 'pin.read_digital':
             print(pins[int(params[1])].read_digital())
         elif cmd == 'pin.write_digital':
@@ -56,6 +322,7 @@ while True:
         elif cmd == 'button.get_presses':
             print(buttons[params[1]].get_presses())
         elif cmd == 'display.clear':
+            end_animation('cancelled')
             display.clear()
             confirm()
         elif cmd == 'display.set_pixel':
@@ -64,23 +331,36 @@ while True:
         elif cmd == 'display.get_pixel':
             print(display.get_pixel(int(params[1]), int(params[2])))
         elif cmd == 'display.show':
+            end_animation('cancelled')
             value_type = params[1]
             value = unescape(params[2])
             delay = int(params[3])
-            wait = params[4] == True
-            loop = params[5] == True
-            clear = params[6] == True
+            wait = params[4] == 'True'
+            loop = params[5] == 'True'
+            clear = params[6] == 'True'
             if value_type == 'img':
                 display.show(Image(value))
-            elif value_type == 'int':
-                display.show(int(value), delay, wait = wait, loop = loop, clear = clear)
-            elif value_type == 'fp':
-                display.show(float(value), delay, wait = wait, loop = loop, clear = clear)
-            elif value_type == 'str':
+                start_animation(wait, False, params[-1], 0)
+            else:
+                if value_type == 'int':
+                    value = int(value)
+                elif value_type == 'fp':
+                    value = float(value)
+                elif value_type == 'imgs':
+                    # the frames of an animation: images and characters, separated by commas
+                    value = [Image(unescape(v.replace('%2C', ','))) for v in params[2].split(',') if v]
                 display.show(value, delay, wait = wait, loop = loop, clear = clear)
+                start_animation(wait, loop, params[-1], (len(value if value_type == 'imgs' else str(value)) + int(clear)) * delay)
             confirm()
         elif cmd == 'display.scroll':
-            display.scroll(params[1])
+            end_animation('cancelled')
+            text = unescape(params[1])
+            delay = int(params[2])
+            wait = params[3] == 'True'
+            loop = params[4] == 'True'
+            display.scroll(text, delay, wait = wait, loop = loop, monospace = params[5] == 'True')
+            # 5 columns and a space per character, scrolled in and out
+            start_animation(wait, loop, params[-1], (len(text) * 6 + 5) * delay)
             confirm()
         elif cmd == 'display.on':
             display.on()
@@ -105,6 +385,21 @@ while True:
         elif cmd == 'music.play':
             music.play(unescape(params[1]).split(), pins[int(params[2])], params[3] == 'True', params[4] == 'True')
             confirm()
+        elif cmd == 'music.play_builtin':
+            music.play(getattr(music, params[1]), pins[int(params[2])], params[3] == 'True', params[4] == 'True')
+            confirm()
+        elif cmd == 'music.load':
+            melody = melodies.get(params[1])
+            if melody is None:
+                melody = melodies[params[1]] = []
+            melody.extend([int(v) for v in params[2:] if v])
+            confirm()
+        elif cmd == 'music.forget':
+            del melodies[params[1]]
+            confirm()
+        elif cmd == 'music.play_melody':
+            play_melody(melodies[params[1]], pins[int(params[2])], params[3] == 'True')
+            confirm()
         elif cmd == 'music.pitch':
             music.pitch(int(params[1]), int(params[2]), pins[int(params[3])], params[4] == 'True')
             confirm()
@@ -114,6 +409,93 @@ while True:
         elif cmd == 'music.reset':
             music.reset()
             confirm()
+        elif cmd == 'stream.start':
+            stream_kind = params[1]
+            if stream_kind == 'music':
+                stream_params = [pins[int(params[2])]]
+            else:
+                stream_params = [int(v) for v in params[2:]]
+            stream_queue = []
+            stream_index = 0
+            stream_ended = False
+            print(STREAM_CREDITS)
+        elif cmd == 'stream.data':
+            if len(stream_queue) >= STREAM_CREDITS:
+                raise ValueError('no stream credits left')
+            if stream_kind == 'music':
+                stream_queue.append([int(v) for v in params[1:] if v])
+            else:
+                stream_queue.append(unescape(params[1]))
+            confirm()
+        elif cmd == 'stream.end':
+            stream_ended = True
+            confirm()
+        elif cmd == 'wait_for':
+            print(wait_for(params[1], params[2], int(params[3]), int(params[4])))
+# mbv2_begin
+        elif cmd == 'log.start':
+            log_sources = [rule_condition(unescape(p).split(' ')) for p in params[2:]]
+            log_interval = int(params[1]) * 1000
+            log_next = ticks_us()
+            confirm()
+        elif cmd == 'log.stop':
+            log_sources = []
+            confirm()
+        elif cmd == 'rule.add':
+            rules[params[1]] = [rule_condition(unescape(params[4]).split(' ')), params[2], int(params[3]),
+                    rule_action(unescape(params[5]).split(' ')), rule_action(unescape(params[6]).split(' ')),
+                    True, None, 0, 0, '']
+            confirm()
+        elif cmd == 'rule.enable':
+            rule = rules[params[1]]
+            rule[5] = params[2] == '1'
+            rule[6] = None
+            rule[9] = ''
+            confirm()
+        elif cmd == 'rule.remove':
+            del rules[params[1]]
+            confirm()
+        elif cmd == 'rule.status':
+            rule = rules[params[1]]
+            print(str(int(rule[5])) + ' ' + str(rule[7]) + ' ' + str(rule[8]) + ' ' + escape(rule[9]))
+        elif cmd == 'watch.start':
+            t = ticks_us()
+            watches[int(params[1])] = [pins[int(params[1])].read_digital(), 0, 0, t, 0, 0, params[2] == '1', 0, t]
+            confirm()
+        elif cmd == 'watch.stop':
+            # the micro:bit may have stopped a failing watch
+            watches.pop(int(params[1]), None)
+            confirm()
+        elif cmd == 'watch.read':
+            watch = watches[int(params[1])]
+            t = ticks_us()
+            print(' '.join([str(v) for v in watch[:3] + watch[4:6]]) + ' ' + str(ticks_diff(t, watch[3])) + ' ' +
+                    str(watch[1] - watch[7]) + ' ' + str(ticks_diff(t, watch[8])))
+            watch[7] = watch[1]
+            watch[8] = t
+# mbv2_end
+        elif cmd == 'sync':
+            print(params[1])
+        elif cmd == 'hello':
+            print(boot)
+        elif cmd == 'telemetry':
+            print(str(gc.mem_free()) + ' ' + str(gc.mem_alloc()) + ' ' + str(commands) + ' ' +
+                    str(exceptions) + ' ' + str(running_time()))
+        elif cmd == 'timing':
+            timed = params[1] == '1'
+            confirm()
+        elif cmd == 'events':
+            events = params[1] == '1'
+            for name in buttons:
+                buttons[name].was_pressed()
+                buttons[name].get_presses()
+            last_pressed = {}
+# mbv2_begin
+            accelerometer.get_gestures()
+            if events:
+                print('!gesture ' + escape(accelerometer.current_gesture()))
+# mbv2_end
+            confirm()
 # mbv2_begin
         elif cmd == 'a.get_x':
             print(accelerometer.get_x())
@@ -160,6 +542,36 @@ while True:
         elif cmd == 'i2c.write':
             i2c.write(bytes.fromhex(params[1]), params[2] == 'True')
             confirm()
+        elif cmd == 'spi.init':
+            spi.init(baudrate = int(params[1]), bits = int(params[2]), mode = int(params[3]),
+                    sclk = pins[int(params[4])], mosi = pins[int(params[5])], miso = pins[int(params[6])])
+            confirm()
+        elif cmd == 'spi.read':
+            print(spi.read(int(params[1])).hex())
+        elif cmd == 'spi.write':
+            spi.write(bytes.fromhex(params[1]))
+            confirm()
+        elif cmd == 'spi.write_readinto':
+            out_buf = bytes.fromhex(params[1])
+            in_buf = bytearray(len(out_buf))
+            spi.write_readinto(out_buf, in_buf)
+            print(in_buf.hex())
+        elif cmd == 'neopixel.init':
+            # the strips are identified by their pin
+            neopixels[params[1]] = neopixel.NeoPixel(pins[int(params[1])], int(params[2]), int(params[3]))
+            confirm()
+        elif cmd == 'neopixel.show':
+            np = neopixels[params[1]]
+            first = int(params[2])
+            data = bytes.fromhex(params[3])
+            bpp = len(np[0])
+            for i in range(len(data) // bpp):
+                np[first + i] = tuple(data[i * bpp:(i + 1) * bpp])
+            np.show()
+            confirm()
+        elif cmd == 'neopixel.clear':
+            neopixels[params[1]].clear()
+            confirm()
         elif cmd == 'radio.on':
             radio.on()
             confirm()
@@ -184,10 +596,11 @@ while True:
             confirm()
         elif cmd == 'speech.say':
             gc.collect()
-            speech.say(unescape(params[1]), \
+            phonemes = speech.translate(unescape(params[1]))
+            speech.pronounce(phonemes, \
                     pitch=int(params[2]), speed=int(params[3]), \
                     mouth=int(params[4]), throat=int(params[5]))
-            confirm()
+            print(escape(phonemes))
         elif cmd == 'speech.sing':
             speech.sing(unescape(params[1]), \
                     pitch=int(params[2]), speed=int(params[3]), \
@@ -202,7 +615,16 @@ while True:
         elif cmd == 'microphone.sound_level':
             print(microphone.sound_level())
 # mbv2_end
+        elif quiet:
+            raise ValueError('Unknown command.')
         else:
             print('ERROR: Unknown command.')
     except Exception as e:
-        print('EXCEPTION: ' + str(e))
+        exceptions += 1
+        if quiet:
+            print('!error ' + quiet + ' ' + escape(str(e)))
+        else:
+            print('EXCEPTION: ' + str(e))
+    if timed and not quiet and cmd != 'sync' and cmd != 'timing' and cmd != 'hello' and cmd != 'manifest':
+        # the time the request was received and the time it took, in microseconds
+        print('@' + str(t_receive) + ' ' + str(ticks_diff(ticks_us(), t_receive)))
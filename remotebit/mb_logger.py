@@ -0,0 +1,169 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Sensor logging for long experiments: the micro:bit samples the sources
+# at a fixed interval and pushes them with its time, the host writes them
+# to memory mapped NumPy .npy files of fixed width records.
+# Host only, not available on the micro:bit.
+
+from microbit import _mb_event_handlers, _mb_loggers, _mb_remember, get_mb_link, mb_unescape
+from mb_rules import _device_call
+from typing import Iterator, List, Optional, Tuple
+import ast
+import mmap
+import struct
+import time
+
+_NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# micro:bit utime.ticks_us() period
+_TICKS_PERIOD = 1 << 30
+
+
+def _on_log_event(params: List[str]) -> Optional[str]:
+    if not _mb_loggers:
+        return None
+    if params[0] == 'error':
+        # !log error message: a source failed, the micro:bit stopped logging
+        _mb_remember('log', None)
+        _mb_loggers[0].error = mb_unescape(params[1]) if len(params) > 1 else ''
+        return f'{repr(_mb_loggers[0].error)} logging the sensors, the logging is stopped'
+    _mb_loggers[0]._add(params)
+    return None
+
+
+_mb_event_handlers['log'] = _on_log_event
+
+
+def _npy_header(names: List[str], count: int) -> bytes:
+    # the number of records is padded, so that it can be updated in place
+    descr = [('t_us', '<i8')] + [(name, '<i4') for name in names]
+    header = f"{{'descr': {descr!r}, 'fortran_order': False, 'shape': ({count:20},), }}"
+    # the data is aligned to 64 bytes
+    size = (len(_NPY_MAGIC) + 2 + len(header) + 1 + 63) // 64 * 64
+    return _NPY_MAGIC + struct.pack('<H', size - len(_NPY_MAGIC) - 2) + \
+            header.ljust(size - len(_NPY_MAGIC) - 3).encode() + b'\n'
+
+
+class SensorLogger:
+    """
+    Samples the sources on the micro:bit every interval_ms and writes the samples
+    to path_0000.npy, path_0001.npy, ... of records_per_file records each:
+    the micro:bit time in us ('t_us') and a 32-bit value per source, e.g.
+
+    logger = SensorLogger('run.npy', [accelerometer.get_x, pin0.read_analog, microphone.sound_level], 5)
+    logger.run(3600)
+    logger.stop()
+
+    Sources: pin read_digital/read_analog/is_touched, button is_pressed,
+    accelerometer get_x/get_y/get_z, compass get_x/get_y/get_z/heading,
+    microphone sound_level. A failing source stops the logging, the error is
+    reported by the next call. The number of records in the file header is updated
+    every sync_records records, so a file of a crashed run has all the records
+    but the last ones. Read the files with numpy.load(path, mmap_mode='r')
+    or read_log_file(path). The samples arrive while the script waits in run()
+    or calls the micro:bit, at most one logger runs at a time.
+    """
+    def __init__(self, path: str, sources: list, interval_ms: int = 10, names: Optional[List[str]] = None,
+            records_per_file: int = 1000000, sync_records: int = 256) -> None:
+        calls = [_device_call(source) for source in sources]
+        self.names = names or [mb_unescape(c).replace(' ', '_') for c in calls]
+        self.path = path[:-4] if path.endswith('.npy') else path
+        self.records_per_file = records_per_file
+        self.sync_records = sync_records
+        self.record = struct.Struct('<q' + 'i' * len(calls))
+        self.header_size = len(_npy_header(self.names, 0))
+        self.files = []
+        self.count = 0
+        self.file = None
+        self.map = None
+        self.file_count = 0
+        # unwrapped micro:bit time, starting at the time of the first sample
+        self.last_ticks = None
+        self.t_us = 0
+        # why the micro:bit stopped logging
+        self.error = None
+        if _mb_loggers:
+            _mb_loggers[0].stop()
+        self._open()
+        _mb_loggers.append(self)
+        request = f'log.start {interval_ms} {" ".join(calls)}'
+        _mb_remember('log', request)
+        get_mb_link().send(request)
+
+    def _open(self) -> None:
+        path = f'{self.path}_{len(self.files):04d}.npy'
+        self.files.append(path)
+        self.file = open(path, 'w+b')
+        self.file.truncate(self.header_size + self.records_per_file * self.record.size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.file_count = 0
+        self._sync()
+
+    def _sync(self) -> None:
+        # the records are written before the header counts them
+        self.map[:self.header_size] = _npy_header(self.names, self.file_count)
+
+    def _close(self) -> None:
+        self._sync()
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(self.header_size + self.file_count * self.record.size)
+        self.file.close()
+
+    def _add(self, params: List[str]) -> None:
+        ticks = int(params[0])
+        if self.last_ticks is None:
+            self.t_us = ticks
+        else:
+            self.t_us += (ticks - self.last_ticks) % _TICKS_PERIOD
+        self.last_ticks = ticks
+        if self.file_count == self.records_per_file:
+            self._close()
+            self._open()
+        self.record.pack_into(self.map, self.header_size + self.file_count * self.record.size,
+                self.t_us, *[int(v) for v in params[1:]])
+        self.file_count += 1
+        self.count += 1
+        if self.file_count % self.sync_records == 0:
+            self._sync()
+
+    def poll(self) -> int:
+        """
+        Writes the samples received so far, returns the number of records written.
+        """
+        get_mb_link().poll_events()
+        return self.count
+
+    def run(self, seconds: float) -> int:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self.poll()
+            time.sleep(0.005)
+        return self.count
+
+    def stop(self) -> None:
+        _mb_remember('log', None)
+        get_mb_link().send('log.stop')
+        # the samples sent before the micro:bit stopped
+        self.poll()
+        _mb_loggers.clear()
+        self._close()
+
+
+def read_log_file(path: str) -> Tuple[List[str], Iterator[tuple]]:
+    """
+    Returns the field names and the records of a file written by SensorLogger.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(_NPY_MAGIC)) != _NPY_MAGIC:
+            raise ValueError(f'remote-bit: {path} is not a .npy file.')
+        header_size = len(_NPY_MAGIC) + 2 + struct.unpack('<H', f.read(2))[0]
+        fields = ast.literal_eval(f.read(header_size - len(_NPY_MAGIC) - 2).decode())
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    names = [name for name, _ in fields['descr']]
+    record = struct.Struct('<q' + 'i' * (len(names) - 1))
+    end = header_size + fields['shape'][0] * record.size
+    return names, record.iter_unpack(memoryview(data)[header_size:end])
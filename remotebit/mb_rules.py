@@ -0,0 +1,99 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Rules evaluated by the micro:bit between the requests, for control loops
+# faster than the serial link round trips.
+# Host only, not available on the micro:bit.
+
+from microbit import AnalogPin, Button, DigitalPin, RemotebitException, _mb_remember, \
+        accelerometer, compass, display, get_mb_link, mb_escape, mb_pin_num, mb_unescape, microphone
+from typing import Optional, Tuple
+import music
+
+_OPERATORS = ('==', '!=', '<', '>', '<=', '>=')
+
+
+def _device_call(function, *args) -> str:
+    # the micro:bit request calling the function, e.g. 'pin.read_analog 0'
+    owner = getattr(function, '__self__', None)
+    name = function.__name__
+    if isinstance(owner, (AnalogPin, DigitalPin)):
+        target = [f'pin.{name}', str(owner.pin)]
+    elif isinstance(owner, Button):
+        target = [f'button.{name}', owner.button_name]
+    elif owner is display:
+        target = [f'display.{name}']
+    elif owner is accelerometer:
+        target = [f'a.{name}']
+    elif owner is compass:
+        target = [f'compass.{name}']
+    elif owner is microphone:
+        target = [f'microphone.{name}']
+    elif function is music.pitch:
+        target = ['music.pitch']
+    else:
+        raise RemotebitException(f'remote-bit: {name} cannot be used in rules.')
+    params = [str(mb_pin_num(a)) if isinstance(a, (AnalogPin, DigitalPin)) else str(int(a)) for a in args]
+    return mb_escape(' '.join(target + params))
+
+
+class Rule:
+    """
+    Runs the action on the micro:bit when the condition becomes true and
+    the otherwise action when it becomes false, e.g. mirror button A to pin 2:
+
+    Rule((button_a.is_pressed, '==', True), (pin2.write_digital, 1), (pin2.write_digital, 0))
+
+    Conditions: pin read_digital/read_analog/is_touched, button is_pressed,
+    accelerometer get_x/get_y/get_z, compass get_x/get_y/get_z/heading,
+    microphone sound_level.
+    Actions: pin write_digital/write_analog, display.set_pixel, music.pitch.
+    """
+    _next_id = 0
+
+    def __init__(self, when: tuple, do: tuple, otherwise: Optional[tuple] = None) -> None:
+        function, operator, value = when
+        if operator not in _OPERATORS:
+            raise RemotebitException(f'remote-bit: rule operator must be one of {" ".join(_OPERATORS)}.')
+        self.id = Rule._next_id
+        Rule._next_id += 1
+        request = f'rule.add {self.id} {operator} {int(value)} {_device_call(function)} ' \
+                f'{_device_call(*do)} {_device_call(*otherwise) if otherwise else "-"}'
+        _mb_remember(f'rule {self.id}', request)
+        get_mb_link().send(request)
+
+    def _status(self) -> list:
+        return get_mb_link().send_receive(f'rule.status {self.id}').split(' ')
+
+    def enable(self) -> None:
+        _mb_remember(f'rule.enable {self.id}', None)
+        get_mb_link().send(f'rule.enable {self.id} 1')
+
+    def disable(self) -> None:
+        _mb_remember(f'rule.enable {self.id}', f'rule.enable {self.id} 0')
+        get_mb_link().send(f'rule.enable {self.id} 0')
+
+    def remove(self) -> None:
+        _mb_remember(f'rule {self.id}', None)
+        _mb_remember(f'rule.enable {self.id}', None)
+        get_mb_link().send(f'rule.remove {self.id}')
+
+    def is_enabled(self) -> bool:
+        """
+        Rules raising an exception on the micro:bit are disabled, see get_error().
+        """
+        return self._status()[0] == '1'
+
+    def get_counts(self) -> Tuple[int, int]:
+        """
+        How many times the condition became true and false.
+        """
+        status = self._status()
+        return int(status[1]), int(status[2])
+
+    def get_error(self) -> str:
+        status = self._status()
+        return mb_unescape(status[3]) if len(status) > 3 else ''
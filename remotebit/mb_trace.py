@@ -0,0 +1,63 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Binary trace files for long captures of the micro:bit serial link traffic.
+# Host only, not available on the micro:bit.
+
+from microbit import TraceRecord, add_trace_hook, remove_trace_hook
+from typing import Iterator
+import struct
+
+_MAGIC = b'RBTRACE1'
+_KINDS = ('request', 'echo', 'reply', 'error', 'timeout', 'timing', 'event')
+# kind, seq, timestamp, size, command length, data length
+_RECORD_HEADER = struct.Struct('<BIdIBI')
+
+
+class TraceFileSink:
+    """
+    Trace hook writing the records to a binary file, e.g.
+
+    with TraceFileSink('session.trace'):
+        ...
+    """
+    def __init__(self, path: str):
+        self.file = open(path, 'wb')
+        self.file.write(_MAGIC)
+
+    def __call__(self, record: TraceRecord) -> None:
+        command = record.command.encode()
+        data = record.data.encode()
+        self.file.write(_RECORD_HEADER.pack(_KINDS.index(record.kind), record.seq,
+                record.timestamp, record.size, len(command), len(data)))
+        self.file.write(command)
+        self.file.write(data)
+
+    def close(self) -> None:
+        remove_trace_hook(self)
+        self.file.close()
+
+    def __enter__(self):
+        add_trace_hook(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def read_trace_file(path: str) -> Iterator[TraceRecord]:
+    with open(path, 'rb') as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f'remote-bit: {path} is not a trace file.')
+        while True:
+            header = f.read(_RECORD_HEADER.size)
+            if len(header) < _RECORD_HEADER.size:
+                # the end of the file or a record truncated by a crash
+                return
+            kind, seq, timestamp, size, command_len, data_len = _RECORD_HEADER.unpack(header)
+            command = f.read(command_len).decode()
+            data = f.read(data_len).decode()
+            yield TraceRecord(_KINDS[kind], seq, timestamp, command, data, size)
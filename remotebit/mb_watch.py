@@ -0,0 +1,102 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# remote:bit is a remote Python execution library for BBC micro:bit
+# https://github.com/voltur01/remotebit
+
+# Pin edge counting and pulse width measurement on the micro:bit,
+# e.g. for encoders, flow meters or tachometers.
+# Host only, not available on the micro:bit.
+
+from microbit import Pin, _mb_defer, _mb_event_handlers, _mb_remember, get_mb_link, mb_pin_num, mb_unescape
+from typing import Callable, List, Optional
+
+# pin number -> PinWatch
+_watches = {}
+
+
+def _on_edge_event(params: List[str]) -> None:
+    watch = _watches.get(int(params[0]))
+    if watch and watch.on_edge:
+        # called between the requests, it may call the micro:bit
+        _mb_defer(watch.on_edge, int(params[1]), int(params[2]))
+
+
+_mb_event_handlers['edge'] = _on_edge_event
+
+
+def _on_watch_event(params: List[str]) -> Optional[str]:
+    # !watch pin error message: the micro:bit stopped the watch
+    watch = _watches.pop(int(params[0]), None)
+    if watch:
+        _mb_remember(f'watch {watch.pin}', None)
+        watch.error = mb_unescape(params[2]) if len(params) > 2 else ''
+        return f'{repr(watch.error)} watching pin {watch.pin}, the watch is stopped'
+    return None
+
+
+_mb_event_handlers['watch'] = _on_watch_event
+
+
+class PinWatch:
+    """
+    The micro:bit polls the pin between the requests and counts the edges,
+    read() gets the counters in a single request, e.g.
+
+    watch = PinWatch(pin1)
+    sleep(1000)
+    watch.read()
+    print(watch.frequency(), watch.duty_cycle())
+
+    on_edge(value, ticks_us) is called for every edge in the event mode,
+    see set_event_mode. The pulses shorter than the polling interval are missed.
+    A watch failing on the micro:bit is stopped and reported by the next call.
+    """
+    def __init__(self, pin: Pin, on_edge: Optional[Callable[[int, int], None]] = None) -> None:
+        self.pin = mb_pin_num(pin)
+        self.on_edge = on_edge
+        self.value = 0
+        self.rising = 0
+        self.falling = 0
+        # width of the last high and low pulses
+        self.high_us = 0
+        self.low_us = 0
+        self.since_edge_us = 0
+        # rising edges and time since the previous read()
+        self.interval_rising = 0
+        self.interval_us = 0
+        # why the micro:bit stopped the watch
+        self.error = None
+        _watches[self.pin] = self
+        request = f'watch.start {self.pin} {int(on_edge is not None)}'
+        _mb_remember(f'watch {self.pin}', request)
+        get_mb_link().send(request)
+
+    def read(self) -> None:
+        values = [int(v) for v in get_mb_link().send_receive(f'watch.read {self.pin}').split()]
+        self.value, self.rising, self.falling, self.high_us, self.low_us, \
+                self.since_edge_us, self.interval_rising, self.interval_us = values
+
+    def frequency(self) -> float:
+        """
+        Rising edges per second between the last two read() calls.
+        """
+        return self.interval_rising * 1000000 / self.interval_us if self.interval_us else 0.0
+
+    def period_us(self) -> int:
+        """
+        Length of the last full period.
+        """
+        return self.high_us + self.low_us
+
+    def duty_cycle(self) -> Optional[float]:
+        """
+        High time ratio of the last full period, None until it was measured.
+        """
+        period = self.period_us()
+        return self.high_us / period if self.high_us and self.low_us else None
+
+    def stop(self) -> None:
+        _mb_remember(f'watch {self.pin}', None)
+        get_mb_link().send(f'watch.stop {self.pin}')
+        _watches.pop(self.pin, None)
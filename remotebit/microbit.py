@@ -7,20 +7,104 @@
 # MicroPython API reference:
 # https://microbit-micropython.readthedocs.io/en/v2-docs/microbit_micropython_api.html
 
-from typing import List, Tuple, Union
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from os import environ as _environ
+import atexit as _atexit
+import math
 import platform
+import struct as _struct
 import sys
+import threading as _threading
+import time as _time
 import serial
 
 class RemotebitException(Exception):
     pass
 
 
+class RemotebitTimeout(RemotebitException):
+    pass
+
+
+class _MicrobitReset(RemotebitException):
+    # the micro:bit was reset while the host waited for its reply
+    pass
+
+
 # Global data
 
 _mb_link = None
+# micro:bit clock estimate, see set_clock_sync
+_mb_clock = None
+# Shared by all the recording links, see init_mb_link
+_mb_record_file = None
 _mb_trace_serial = False
 _mb_raise = False
+# Functions called with a TraceRecord for every message to and from micro:bit
+_mb_trace_hooks = []
+# Event mode: the micro:bit pushes the events, see set_event_mode
+_mb_events = False
+# Functions handling the events pushed by the micro:bit: event name -> function(params)
+_mb_event_handlers = {}
+# User callbacks of the events: (function, args), called after the current request,
+# since they may call the micro:bit, see _mb_defer
+_mb_deferred = []
+# Running non-blocking display animations: id -> DisplayAnimation
+_mb_animations = {}
+# the chunked playback in progress, see _mb_stream
+_mb_streaming = None
+# Running sensor logger, see mb_logger.SensorLogger
+_mb_loggers = []
+
+# Requests restoring the micro:bit state after it was reset or reconnected: key -> request,
+# see _mb_remember, and functions restoring the rest of it, called after the requests
+_mb_state = {}
+_mb_restore_hooks = []
+# Time in seconds to wait for a disconnected micro:bit to come back
+_mb_reconnect_timeout = 10
+# Per command metrics: command name -> _CommandMetrics, None - disabled
+_mb_metrics = None
+# micro:bit memory and health samples, see set_telemetry
+_mb_telemetry = None
+
+# Default time in seconds to wait for a request to complete, None - wait forever
+_mb_timeout = None
+# Number of times a timed out idempotent request is repeated
+_mb_retries = 2
+# Time in seconds to wait for the micro:bit to catch up after a timeout
+_mb_sync_timeout = 5
+# Serial port read timeout in seconds, fixed as changing it reconfigures the port,
+# the request deadlines are checked this often
+_mb_read_interval = 0.05
+
+# Maximum number of binary payload bytes sent in a single request line,
+# longer buffers are transferred in chunks.
+_mb_max_chunk = 128
+# micro:bit heap bytes taken by a payload byte in a request: hex digits, the line and the decoded byte
+_mb_payload_byte_cost = 6
+
+# Write coalescing, see set_write_coalescing: buffered bytes sent together, 0 - disabled,
+# and the time in seconds the buffered requests may wait
+_mb_coalesce_bytes = 0
+_mb_coalesce_delay = 0.005
+
+# Unacknowledged requests, see set_unacknowledged, and the maximum number of
+# their bytes not yet echoed by the micro:bit, so that its receive buffer does not overflow
+_mb_unacknowledged = False
+_mb_unacknowledged_window = 64
+
+# Requests that can be safely repeated, since they do not change any state
+_mb_idempotent_commands = {
+    'pin.read_digital', 'pin.read_analog', 'pin.is_touched',
+    'button.is_pressed',
+    'display.get_pixel', 'display.is_on', 'display.read_light_level',
+    'running_time', 'temperature', 'music.get_tempo',
+    'a.get_x', 'a.get_y', 'a.get_z', 'a.get_values', 'a.current_gesture', 'a.is_gesture',
+    'compass.is_calibrated', 'compass.get_x', 'compass.get_y', 'compass.get_z',
+    'compass.heading', 'compass.get_field_strength',
+    'i2c.scan', 'speech.translate', 'microphone.sound_level',
+}
 
 if platform.system() == 'Windows':
     _mb_default_serial_name = 'COM7'
@@ -28,13 +112,60 @@ elif platform.system() == 'Darwin':
     _mb_default_serial_name = '/dev/tty.usbmodem102'
 else:
     _mb_default_serial_name = '/dev/ttyACM0'
+# e.g. to use the emulator
+_mb_default_serial_name = _environ.get('REMOTEBIT_SERIAL', _mb_default_serial_name)
 
 # micro:bit serial link
 
 
+class TraceRecord:
+    """
+    kind - 'request', 'echo', 'reply', 'error', 'timeout', 'timing' or 'event'
+    seq - sequence number of the request the record belongs to
+    timestamp - host time in seconds since the epoch
+    command - request command name, e.g. 'pin.read_analog'
+    data - request parameters, received line or error message
+    size - number of bytes sent or received
+    """
+    __slots__ = ('kind', 'seq', 'timestamp', 'command', 'data', 'size')
+
+    def __init__(self, kind: str, seq: int, timestamp: float, command: str, data: str, size: int):
+        self.kind = kind
+        self.seq = seq
+        self.timestamp = timestamp
+        self.command = command
+        self.data = data
+        self.size = size
+
+    def __repr__(self) -> str:
+        return f'TraceRecord({self.kind!r}, {self.seq}, {self.timestamp}, ' \
+                f'{self.command!r}, {self.data!r}, {self.size})'
+
+
+def add_trace_hook(hook: Callable[[TraceRecord], None]) -> None:
+    if hook not in _mb_trace_hooks:
+        _mb_trace_hooks.append(hook)
+
+
+def remove_trace_hook(hook: Callable[[TraceRecord], None]) -> None:
+    if hook in _mb_trace_hooks:
+        _mb_trace_hooks.remove(hook)
+
+
+def _print_trace(record: TraceRecord) -> None:
+    if record.kind == 'request':
+        print('TRACE: request ' + repr(f'{record.command} {record.data}'.rstrip(' ') + '\r\n'))
+    else:
+        print(f'TRACE: {record.kind} {repr(record.data)}')
+
+
 def set_trace_serial(on: bool) -> None:
     global _mb_trace_serial
     _mb_trace_serial = on
+    if on:
+        add_trace_hook(_print_trace)
+    else:
+        remove_trace_hook(_print_trace)
 
 
 def set_raise(on: bool) -> None:
@@ -42,78 +173,1079 @@ def set_raise(on: bool) -> None:
     _mb_raise = on
 
 
-def _report_error(msg: str) -> None:
+def set_timeout(seconds: Optional[float]) -> None:
+    global _mb_timeout
+    _mb_timeout = seconds
+
+
+def set_retries(n: int) -> None:
+    global _mb_retries
+    _mb_retries = n
+
+
+@contextmanager
+def mb_timeout(seconds: Optional[float]):
+    """
+    Overrides the default timeout for the requests sent within the with block.
+    """
+    global _mb_timeout
+    previous = _mb_timeout
+    _mb_timeout = seconds
+    try:
+        yield
+    finally:
+        _mb_timeout = previous
+
+
+def set_metrics(on: bool) -> None:
+    global _mb_metrics
+    if not on:
+        _mb_metrics = None
+    elif _mb_metrics is None:
+        _mb_metrics = {}
+
+
+def reset_metrics() -> None:
+    if _mb_metrics is not None:
+        _mb_metrics.clear()
+
+
+def get_metrics() -> Dict[str, dict]:
+    """
+    Returns the snapshot of the metrics collected per command since
+    set_metrics(True) or reset_metrics(), latencies are in milliseconds.
+    """
+    if _mb_metrics is None:
+        return {}
+    return {command: metrics.snapshot() for command, metrics in _mb_metrics.items()}
+
+
+def set_telemetry(on: bool, interval: float = 5.0) -> None:
+    """
+    When on, the micro:bit memory and health is sampled every interval seconds
+    at the next request, see get_device_metrics. The chunks of the long
+    payloads are then limited to the free memory of the micro:bit.
+    """
+    global _mb_telemetry
+    _mb_telemetry = _Telemetry(interval) if on else None
+
+
+def get_telemetry() -> Dict[str, int]:
+    """
+    Samples the micro:bit: free and allocated heap bytes, requests processed,
+    exceptions raised and time since the start in ms. The size of the largest
+    free heap block is not available in the micro:bit MicroPython.
+    """
+    reply = _mb_link.send_receive('telemetry')
+    if _mb_telemetry is not None:
+        return _mb_telemetry.add(reply)
+    return _Telemetry.parse(reply)
+
+
+def get_device_metrics() -> Dict[str, int]:
+    """
+    Returns the last sample taken by set_telemetry(True) with the lowest free heap
+    seen and the number of samples, empty if the telemetry is off or not sampled yet.
+    """
+    if _mb_telemetry is None or _mb_telemetry.last is None:
+        return {}
+    return _mb_telemetry.snapshot()
+
+
+def _mb_chunk(size: int, item_bytes: int) -> int:
+    """
+    Limits the number of items sent in a request, e.g. bytes or notes taking
+    about item_bytes each to handle, to 1/8 of the last reported free heap.
+    """
+    if _mb_telemetry is None or _mb_telemetry.last is None:
+        return size
+    return max(1, min(size, _mb_telemetry.last['mem_free'] // (8 * item_bytes)))
+
+
+def set_event_mode(on: bool) -> None:
+    """
+    When on, the micro:bit pushes the button and gesture events to the host,
+    so that the buttons and accelerometer gestures are answered without
+    a round trip to the micro:bit.
+    """
+    global _mb_events
+    if on:
+        button_a._reset_events()
+        button_b._reset_events()
+        accelerometer._reset_events()
+        _mb_events = True
+        _mb_remember('events', 'events 1')
+        _mb_link.send('events 1')
+        # the micro:bit reports the current gesture, it is not a new one
+        accelerometer._gestures = []
+        accelerometer._was_gestures = set()
+    else:
+        _mb_remember('events', None)
+        _mb_link.send('events 0')
+        _mb_events = False
+
+
+def set_unacknowledged(on: bool) -> None:
+    """
+    When on, the micro:bit does not confirm the requests that do not return
+    a value, so they do not wait for the micro:bit. Their errors are reported
+    by the next call returning a value or sync().
+    """
+    global _mb_unacknowledged
+    _mb_unacknowledged = on
+
+
+@contextmanager
+def mb_unacknowledged():
+    """
+    Sends the requests within the with block unacknowledged, see set_unacknowledged.
+    """
+    global _mb_unacknowledged
+    previous = _mb_unacknowledged
+    _mb_unacknowledged = True
+    try:
+        yield
+    finally:
+        _mb_unacknowledged = previous
+
+
+def sync() -> None:
+    """
+    Waits until the micro:bit executed all the requests sent so far
+    and reports the errors of the unacknowledged ones.
+    """
+    _mb_link.sync()
+
+
+def set_reconnect_timeout(seconds: float) -> None:
+    global _mb_reconnect_timeout
+    _mb_reconnect_timeout = seconds
+
+
+def _mb_remember(key: str, request: Optional[str]) -> None:
+    """
+    Remembers the request to repeat when the micro:bit was reset or reconnected,
+    None forgets it. The requests are repeated in the order they were remembered.
+    """
+    _mb_state.pop(key, None)
+    if request is not None:
+        _mb_state[key] = request
+
+
+def _mb_defer(function: Callable, *args) -> None:
+    """
+    Calls the function once the current request is complete, for the event handlers
+    calling user code, which may call the micro:bit.
+    """
+    _mb_deferred.append((function, args))
+
+
+def _mb_find_ports() -> List[str]:
+    # micro:bit DAPLink USB interface
+    from serial.tools import list_ports
+    return [p.device for p in list_ports.comports() if (p.vid, p.pid) == (0x0D28, 0x0204)]
+
+
+def set_write_coalescing(on: bool, max_bytes: int = 64, max_delay: float = 0.005) -> None:
+    """
+    When on, the requests that do not return a value are buffered and sent
+    to the micro:bit together, when max_bytes are buffered, max_delay seconds
+    passed, a request returning a value is sent or at sleep() and utime.sleep_ms().
+    Their errors are reported by the call sending them.
+    max_bytes should not exceed the micro:bit serial receive buffer.
+    """
+    global _mb_coalesce_bytes, _mb_coalesce_delay
+    if not on:
+        _mb_link.flush()
+    _mb_coalesce_bytes = max_bytes if on else 0
+    _mb_coalesce_delay = max_delay
+    _atexit.unregister(_flush_writes)
+    if on:
+        _atexit.register(_flush_writes)
+
+
+def _flush_writes() -> None:
+    _mb_link.flush()
+
+
+def set_device_timing(on: bool) -> None:
+    """
+    When on, the micro:bit reports the time it received every request
+    and the time it took to execute it, see get_last_timing.
+    """
+    serial_link = _mb_link.link if isinstance(_mb_link, RecordingLink) else _mb_link
+    if not isinstance(serial_link, SerialLink):
+        serial_link = None
+    # the micro:bit does not report the timing of the timing request itself
+    _mb_link.flush()
+    if serial_link and not on:
+        serial_link.timing = False
+    _mb_link.send(f'timing {int(on)}')
+    _mb_link.flush()
+    if serial_link and on:
+        serial_link.timing = True
+
+
+def get_last_timing() -> Optional[Tuple[int, int]]:
+    """
+    Returns the micro:bit utime.ticks_us() when the last request was received
+    and its execution time in microseconds, None if not available.
+    """
+    serial_link = _mb_link.link if isinstance(_mb_link, RecordingLink) else _mb_link
+    return getattr(serial_link, 'last_timing', None)
+
+
+class _Histogram:
+    # Buckets per doubling of the value, i.e. ~9% resolution
+    BUCKETS_PER_OCTAVE = 8
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = {}
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        bucket = int(math.log2(max(seconds, 1e-6) * 1e6) * self.BUCKETS_PER_OCTAVE)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def mean_ms(self) -> float:
+        return self.total_seconds * 1000 / self.count if self.count else 0.0
+
+    def percentile_ms(self, p: float) -> float:
+        rank = p / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # the upper bound of the bucket, but not more than the actual maximum
+                upper_us = 2 ** ((bucket + 1) / self.BUCKETS_PER_OCTAVE)
+                return min(upper_us / 1000, self.max_seconds * 1000)
+        return self.max_seconds * 1000
+
+
+class _CommandMetrics:
+    def __init__(self):
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = _Histogram()
+        # execution time on the micro:bit, see set_device_timing
+        self.device_time = _Histogram()
+
+    def add(self, seconds: float, bytes_sent: int, bytes_received: int) -> None:
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.latency.add(seconds)
+
+    def snapshot(self) -> dict:
+        snapshot = {
+            'count': self.latency.count,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'mean_ms': self.latency.mean_ms(),
+            'p50_ms': self.latency.percentile_ms(50),
+            'p95_ms': self.latency.percentile_ms(95),
+            'p99_ms': self.latency.percentile_ms(99),
+            'max_ms': self.latency.max_seconds * 1000,
+        }
+        if self.device_time.count:
+            snapshot.update({
+                'device_mean_ms': self.device_time.mean_ms(),
+                'device_p50_ms': self.device_time.percentile_ms(50),
+                'device_p95_ms': self.device_time.percentile_ms(95),
+                'device_p99_ms': self.device_time.percentile_ms(99),
+                'device_max_ms': self.device_time.max_seconds * 1000,
+            })
+        return snapshot
+
+
+class _Telemetry:
+    FIELDS = ('mem_free', 'mem_alloc', 'commands', 'exceptions', 'uptime_ms')
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last = None
+        self.last_sampled = None
+        self.min_mem_free = None
+        self.samples = 0
+
+    @staticmethod
+    def parse(reply: str) -> Dict[str, int]:
+        return dict(zip(_Telemetry.FIELDS, [int(v) for v in reply.split()]))
+
+    def due(self) -> bool:
+        return self.last_sampled is None or _time.monotonic() - self.last_sampled >= self.interval
+
+    def add(self, reply: str) -> Dict[str, int]:
+        sample = self.parse(reply)
+        self.last = sample
+        self.last_sampled = _time.monotonic()
+        self.samples += 1
+        if self.min_mem_free is None or sample['mem_free'] < self.min_mem_free:
+            self.min_mem_free = sample['mem_free']
+        return sample
+
+    def snapshot(self) -> dict:
+        return dict(self.last, min_mem_free=self.min_mem_free, samples=self.samples)
+
+
+def _report_error(msg: str, exception_class: type = RemotebitException) -> None:
     if _mb_raise:
-        raise RemotebitException(msg)
+        raise exception_class(msg)
     else:
         print('ERROR: micro:bit response: ' + msg)
         sys.exit(1)
 
-def _trace(msg: str) -> None:
-    if _mb_trace_serial:
-        print('TRACE: ' + msg)
+def _trace(kind: str, seq: int, command: str, data: str, size: int) -> None:
+    record = TraceRecord(kind, seq, _time.time(), command, data, size)
+    for hook in _mb_trace_hooks:
+        hook(record)
 
 
 class SerialLink:
     def __init__(self, path):
-        self.port = serial.Serial(path, '115200')
-
-    def send(self, request: str, confirm: bool = True) -> None:
-        request += '\r\n'
-
-        self.port.write(request.encode())
-        echo = self.port.readline().decode()
-
-        _trace('request ' + repr(request))
-        _trace('echo ' + repr(echo))
-
-        if echo != request:
-            while self.port.in_waiting:
-                echo += self.port.readline().decode()
-            _report_error(f'{repr(echo)} for reqest {repr(request)}')
+        self.path = path
+        self.port = serial.Serial(path, 115200, timeout=_mb_read_interval)
+        self.sync_id = 0
+        # the first request synchronizes and checks which micro:bit boot it talks to
+        self.in_sync = False
+        self.boot = None
+        self.rebooted = False
+        # waiting for a reply, which a reset micro:bit never sends, and restoring its state
+        self.replying = False
+        self.restoring = False
+        # requests handled by an application built by mb_build_app.py, None - all
+        self.manifest = None
+        self.commands = None
+        self.bytes_received = 0
+        self.timeouts = 0
+        # requests sent by _exchange, including the repeated ones
+        self.transmissions = 0
+        self.seq = 0
+        # micro:bit timing of the requests, see set_device_timing
+        self.timing = False
+        self.last_timing = None
+        # received, but not yet processed data and how much of it was scanned for a line end
+        self.rx = bytearray()
+        self.rx_scanned = 0
+        # buffered requests, see set_write_coalescing, and the requests sent,
+        # but not confirmed yet: (seq, request)
+        self.tx = bytearray()
+        self.unconfirmed = []
+        self.unconfirmed_bytes = 0
+        self.timer = None
+        # unacknowledged requests not echoed yet: seq -> request, their size,
+        # the last echoed one (seq, request) and the errors reported by the micro:bit
+        self.unacked = {}
+        self.unacked_bytes = 0
+        self.echoed = None
+        self.errors = []
+        # the last request started and the last one written to the port, not repeated after a reconnect
+        self.started = None
+        self.written = None
+        # the buffered requests are sent by the timer thread as well,
+        # reentrant for the deferred event callbacks calling the micro:bit
+        self.lock = _threading.RLock()
+
+    def _deadline(self, timeout: Optional[float]) -> Optional[float]:
+        if timeout is None:
+            timeout = _mb_timeout
+        return None if timeout is None else _time.monotonic() + timeout
+
+    def _receive(self) -> None:
+        if not self.port.is_open:
+            # pyserial in_waiting fails with TypeError otherwise
+            raise serial.SerialException('port is closed')
+        waiting = self.port.in_waiting
+        if waiting:
+            data = self.port.read(waiting)
+            self.rx += data
+            self.bytes_received += len(data)
+
+    def _fill(self, deadline: Optional[float]) -> None:
+        """
+        Waits for at least one byte, then takes everything received so far,
+        instead of pyserial readline() reading byte by byte.
+        """
+        data = self.port.read(max(self.port.in_waiting, 1))
+        while not data:
+            if deadline is not None and _time.monotonic() >= deadline:
+                raise RemotebitTimeout(f'timeout, received {repr(self.rx.decode(errors="replace"))}')
+            data = self.port.read(max(self.port.in_waiting, 1))
+        self.rx += data
+        self.bytes_received += len(data)
+
+    def _next_line(self, deadline: Optional[float]) -> bytes:
+        end = self.rx.find(b'\n', self.rx_scanned)
+        while end < 0:
+            self.rx_scanned = len(self.rx)
+            self._fill(deadline)
+            end = self.rx.find(b'\n', self.rx_scanned)
+        line = bytes(self.rx[:end + 1])
+        # deleting from the front of a bytearray does not move the rest of the data
+        del self.rx[:end + 1]
+        self.rx_scanned = 0
+        return line
+
+    def _consume(self, line: bytes) -> bool:
+        """
+        Processes the echoes of the unacknowledged requests and the events.
+        """
+        if line.startswith(b'!boot '):
+            # the micro:bit was reset, its state is restored after the current request,
+            # the request waiting for a reply is aborted
+            self.rebooted = True
+            if self.replying and not self.restoring:
+                raise _MicrobitReset('micro:bit was reset, no reply')
+            return True
+        if line.startswith((b'!fault ', b'!watch ')):
+            # the micro:bit failed while idle, pushed whatever the host waits for
+            self._dispatch_event(line.decode())
+            return True
+        if self.unacked and line.startswith(b'~'):
+            self._on_unacked_echo(line)
+            return True
+        if line.startswith(b'!') and (_mb_events or self.echoed or _mb_animations or _mb_streaming or _mb_loggers):
+            self._dispatch_event(line.decode())
+            return True
+        return False
+
+    def _readline_bytes(self, deadline: Optional[float]) -> bytes:
+        line = self._next_line(deadline)
+        while self._consume(line):
+            line = self._next_line(deadline)
+        return line
+
+    def _readline(self, deadline: Optional[float]) -> str:
+        return self._readline_bytes(deadline).decode()
+
+    def _dispatch_event(self, line: str) -> None:
+        if _mb_trace_hooks:
+            _trace('event', self.seq, '', line, len(line))
+        name, *params = line[1:].split()
+        if name == 'error' and self.echoed:
+            seq, request = self.echoed
+            request = request.partition(' ')[2]
+            if params[0] == str(seq):
+                message = mb_unescape(params[1]) if len(params) > 1 else ''
+                self.errors.append(f'{repr(message)} for request {repr(request)}')
+                if _mb_trace_hooks:
+                    _trace('error', seq, request.partition(' ')[0], self.errors[-1], 0)
+                return
+        handler = _mb_event_handlers.get(name)
+        if handler:
+            # the handlers return the errors to report by the current call
+            error = handler(params)
+            if error:
+                self.errors.append(error)
+
+    def _receive_events(self) -> None:
+        self._receive()
+        while self.rx.startswith((b'!', b'~')) and b'\n' in self.rx:
+            line = self._next_line(None)
+            if not self._consume(line):
+                self._dispatch_event(line.decode())
+
+    def _poll_events(self) -> None:
+        self._receive_events()
+        self._report_errors()
+
+    def _check_reset(self) -> None:
+        # a micro:bit reset while the link was idle is restored before the next request,
+        # rather than aborting it when its !boot is read with the reply
+        self._receive_events()
+        if self.rebooted:
+            self._restore()
+
+    def _resync(self, sync_timeout: Optional[float] = None) -> None:
+        """
+        Discards the replies to the timed out requests: sends a sync request
+        and skips everything up to its unique reply. Restores the micro:bit state
+        if it was reset meanwhile.
+        """
+        restoring = self.restoring
+        self.restoring = True
+        try:
+            self._sync_boot(sync_timeout)
+        finally:
+            self.restoring = restoring
+        if self.rebooted:
+            self._restore()
+
+    def _sync_boot(self, sync_timeout: Optional[float]) -> None:
+        self.in_sync = False
+        self.sync_id += 1
+        token = f'sync{self.sync_id}'
+        self.port.reset_input_buffer()
+        self.rx.clear()
+        self.rx_scanned = 0
+        self.unacked.clear()
+        self.unacked_bytes = 0
+        self.echoed = None
+        self.port.write(f'sync {token}\r\n'.encode())
+        deadline = _time.monotonic() + (sync_timeout or _mb_sync_timeout)
+        while self._readline(deadline).strip() != token:
+            pass
+        self.in_sync = True
+        # the micro:bit does not report the timing of hello
+        timing = self.timing
+        self.timing = False
+        try:
+            # the applications built for a script add their manifest id
+            boot, _, manifest = self._request('hello', False, deadline).partition(' ')
+            if not manifest:
+                self.commands = None
+            elif manifest != self.manifest:
+                self.commands = set(self._request('manifest', False, deadline).split())
+            self.manifest = manifest
+        finally:
+            self.timing = timing
+        self.rebooted = self.boot is not None and boot != self.boot
+        self.boot = boot
+
+    def _restore(self) -> None:
+        self.rebooted = False
+        self.tx.clear()
+        self.unconfirmed.clear()
+        self.unconfirmed_bytes = 0
+        timing = self.timing
+        self.timing = False
+        restoring = self.restoring
+        self.restoring = True
+        try:
+            for request in list(_mb_state.values()):
+                self._request(request, True, self._deadline(None))
+        finally:
+            self.restoring = restoring
+        if timing:
+            self._request('timing 1', True, self._deadline(None))
+            self.timing = True
+        for hook in _mb_restore_hooks:
+            hook()
+
+    def _reconnect(self) -> None:
+        """
+        Reopens the port, or finds the micro:bit on another one, and restores the micro:bit state.
+        """
+        try:
+            self.port.close()
+        except (serial.SerialException, OSError):
+            pass
+        self.tx.clear()
+        self.unconfirmed.clear()
+        self.unconfirmed_bytes = 0
+        deadline = _time.monotonic() + _mb_reconnect_timeout
+        while True:
+            for path in [self.path] + [p for p in _mb_find_ports() if p != self.path]:
+                try:
+                    self.port = serial.Serial(path, 115200, timeout=_mb_read_interval)
+                except (serial.SerialException, OSError):
+                    continue
+                try:
+                    # a micro:bit replugged, but not reset is restored as well
+                    self.boot = None
+                    self._resync(1)
+                    self.path = path
+                    self._restore()
+                    return
+                except (serial.SerialException, OSError, RemotebitTimeout):
+                    self.port.close()
+            if _time.monotonic() > deadline:
+                _report_error(f'micro:bit disconnected from {self.path}')
+            _time.sleep(0.1)
+
+    def _reconnecting(self, function: Callable, *args):
+        with self.lock:
+            self.written = None
+            try:
+                result = function(*args)
+            except (serial.SerialException, OSError):
+                request = args[0] if args else None
+                written = request is not None and self.written == request and request.partition(' ')[0] not in _mb_idempotent_commands
+                self._reconnect()
+                if not written:
+                    result = function(*args)
+                elif function == self._send:
+                    # the request may have been executed, the remembered state is restored instead
+                    result = None
+                else:
+                    _report_error(f'micro:bit disconnected during request {repr(request)}, it may have been executed')
+            except _MicrobitReset:
+                # the buffered requests were lost
+                self._resync()
+                _report_error('micro:bit was reset, the buffered requests may not have been executed')
+            if self.rebooted:
+                self._restore()
+            if _mb_telemetry is not None and _mb_telemetry.due():
+                _mb_telemetry.add(self._send_receive('telemetry', None))
+            while _mb_deferred:
+                deferred, deferred_args = _mb_deferred.pop(0)
+                deferred(*deferred_args)
+            return result
+
+    def _start(self, request: str) -> str:
+        if self.commands is not None and request.partition(' ')[0] not in self.commands:
+            _report_error(f'{request.partition(" ")[0]} is not handled by the micro:bit application, '
+                    f'rebuild it with mb_build_app.py')
+        self.seq += 1
+        self.last_timing = None
+        self.started = request
+        if _mb_trace_hooks:
+            command, _, args = request.partition(' ')
+            _trace('request', self.seq, command, args, len(request) + 2)
+        return request + '\r\n'
+
+    def _request(self, request: str, confirm: bool, deadline: Optional[float]) -> str:
+        if not self.in_sync:
+            self._resync()
+        else:
+            self._check_reset()
+
+        request = self._start(request)
+        self.written = self.started
+        if self.tx:
+            # the buffered requests go out together with this one
+            self.tx += request.encode()
+            self._write_buffered()
+        else:
+            self.port.write(request.encode())
+        self._confirm_writes()
+        reply = self._reply(self.seq, request, confirm, deadline)
+        # the micro:bit executed the unacknowledged requests sent before
+        self.echoed = None
+        return reply
+
+    def _reply(self, seq: int, request: str, confirm: bool, deadline: Optional[float]) -> str:
+        replying = self.replying
+        self.replying = True
+        try:
+            return self._read_reply(seq, request, confirm, deadline)
+        finally:
+            self.replying = replying
+
+    def _read_reply(self, seq: int, request: str, confirm: bool, deadline: Optional[float]) -> str:
+        tracing = bool(_mb_trace_hooks)
+        command = request.partition(' ')[0]
+        echo = self._readline_bytes(deadline)
+
+        if tracing:
+            _trace('echo', seq, command, echo.decode(), len(echo))
+
+        if echo != request.encode():
+            self._receive()
+            echo = (echo + self.rx).decode(errors='replace')
+            self.rx.clear()
+            self.rx_scanned = 0
+            self._error(request, f'{repr(echo)} for reqest {repr(request)}', seq)
         if confirm:
-            confirmation = self.port.readline().decode().strip()
+            confirmation = self._readline(deadline)
+            if tracing:
+                _trace('reply', seq, command, confirmation, len(confirmation))
+            if self.timing:
+                timing = self._read_timing(deadline)
+                if tracing:
+                    _trace('timing', seq, command, timing, len(timing))
+            confirmation = confirmation.strip()
             if confirmation != 'ok':
-                _report_error(f'{repr(confirmation)} for request {repr(request)}')
+                self._error(request, f'{repr(confirmation)} for request {repr(request)}', seq)
+            return confirmation
 
-    def send_receive(self, request: str) -> str:
-        self.send(request, confirm=False)
-        response = self.port.readline().decode()
-        
-        _trace('response ' + repr(response))
+        response = self._readline(deadline)
+
+        if tracing:
+            _trace('reply', seq, command, response, len(response))
+        if self.timing:
+            timing = self._read_timing(deadline)
+            if tracing:
+                _trace('timing', seq, command, timing, len(timing))
 
         if response.startswith('EXCEPTION:'):
-            _report_error(f'{repr(response)} for request {repr(request)}')
-        
+            self._error(request, f'{repr(response)} for request {repr(request)}', seq)
+
         return response.strip()
 
+    def _buffer(self, request: str) -> None:
+        if not self.in_sync:
+            self._resync()
+        else:
+            self._check_reset()
+        request = self._start(request)
+        self.tx += request.encode()
+        self.unconfirmed.append((self.seq, request))
+        self.unconfirmed_bytes += len(request)
+        if self.unconfirmed_bytes >= _mb_coalesce_bytes:
+            self._write_buffered()
+            self._confirm_writes()
+        else:
+            self._start_timer()
+
+    def _send_unacknowledged(self, request: str) -> None:
+        if not self.in_sync:
+            self._resync()
+        else:
+            self._check_reset()
+        request = self._start(request)
+        seq = self.seq
+        request = f'~{seq} {request}'
+        self.unacked[seq] = request
+        self.unacked_bytes += len(request)
+        if _mb_coalesce_bytes:
+            self.tx += request.encode()
+            if len(self.tx) >= _mb_coalesce_bytes:
+                self._write_buffered()
+            else:
+                self._start_timer()
+        else:
+            self.written = self.started
+            self.port.write(request.encode())
+        # wait for the micro:bit to catch up
+        deadline = self._deadline(None)
+        while self.unacked_bytes > _mb_unacknowledged_window:
+            if self.tx:
+                self._write_buffered()
+            line = self._next_line(deadline)
+            if not self._consume(line):
+                self._error(request, f'unexpected {repr(line.decode())} for request {repr(request)}')
+
+    def _on_unacked_echo(self, echo: bytes) -> None:
+        seq = int(echo[1:echo.index(b' ')])
+        for unacked_seq in [s for s in self.unacked if s <= seq]:
+            request = self.unacked.pop(unacked_seq)
+            self.unacked_bytes -= len(request)
+        self.echoed = (seq, request)
+        if _mb_trace_hooks:
+            _trace('echo', seq, request.partition(' ')[2].partition(' ')[0], echo.decode(), len(echo))
+
+    def _report_errors(self) -> None:
+        if self.errors:
+            errors = self.errors
+            self.errors = []
+            more = f' and {len(errors) - 1} more errors' if len(errors) > 1 else ''
+            _report_error(errors[0] + more)
+
+    def _sync(self) -> None:
+        if self.tx:
+            self._write_buffered()
+        self._confirm_writes()
+        if self.unacked or self.echoed:
+            self.sync_id += 1
+            token = f'sync{self.sync_id}'
+            self.port.write(f'sync {token}\r\n'.encode())
+            deadline = self._deadline(None)
+            while self._readline(deadline).strip() != token:
+                pass
+            self.echoed = None
+        self._report_errors()
+
+    def _start_timer(self) -> None:
+        if self.timer is None:
+            self.timer = _threading.Timer(_mb_coalesce_delay, self._on_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _write_buffered(self) -> None:
+        self.written = self.started
+        self.port.write(self.tx)
+        self.tx.clear()
+
+    def _on_timer(self) -> None:
+        # only sends, the confirmations are checked by the next call
+        with self.lock:
+            self.timer = None
+            try:
+                if self.tx:
+                    self._write_buffered()
+            except (serial.SerialException, OSError):
+                # reconnected by the next call
+                pass
+
+    def _confirm_writes(self) -> None:
+        while self.unconfirmed:
+            seq, request = self.unconfirmed.pop(0)
+            try:
+                self._reply(seq, request, True, self._deadline(None))
+            except RemotebitException:
+                # the replies to the following requests are skipped by resync
+                self.tx.clear()
+                self.unconfirmed.clear()
+                self.in_sync = False
+                raise
+            finally:
+                self.unconfirmed_bytes = sum([len(r) for _, r in self.unconfirmed])
+
+    def _flush(self) -> None:
+        if self.tx:
+            self._write_buffered()
+        self._confirm_writes()
+
+    def _read_timing(self, deadline: Optional[float]) -> str:
+        line = self._readline(deadline)
+        if line.startswith('@'):
+            receive_us, execution_us = line[1:].split()
+            self.last_timing = (int(receive_us), int(execution_us))
+        return line
+
+    def _error(self, request: str, msg: str, seq: Optional[int] = None) -> None:
+        if _mb_trace_hooks:
+            _trace('error', self.seq if seq is None else seq, request.partition(' ')[0], msg, 0)
+        _report_error(msg)
+
+    def _timed_out(self, request: str) -> None:
+        if _mb_trace_hooks:
+            _trace('timeout', self.seq, request.partition(' ')[0], f'timeout for request {repr(request)}', 0)
+        try:
+            self._resync()
+        except RemotebitTimeout:
+            pass
+
+    def _exchange(self, request: str, confirm: bool, timeout: Optional[float], retries: int) -> str:
+        for attempt in range(retries + 1):
+            self.transmissions += 1
+            try:
+                return self._request(request, confirm, self._deadline(timeout))
+            except RemotebitTimeout as e:
+                self.timeouts += 1
+                self._timed_out(request)
+                error = e
+            except _MicrobitReset as e:
+                # restores the micro:bit state, only the idempotent requests are repeated
+                self._resync()
+                error = e
+        _report_error(f'{str(error)} for request {repr(request)}',
+                RemotebitTimeout if isinstance(error, RemotebitTimeout) else RemotebitException)
+
+    def _measured_exchange(self, request: str, confirm: bool, timeout: Optional[float], retries: int) -> str:
+        command = request.partition(' ')[0]
+        metrics = _mb_metrics.get(command)
+        if metrics is None:
+            metrics = _mb_metrics[command] = _CommandMetrics()
+        bytes_received = self.bytes_received
+        timeouts = self.timeouts
+        transmissions = self.transmissions
+        start = _time.perf_counter()
+        try:
+            return self._exchange(request, confirm, timeout, retries)
+        except RemotebitTimeout:
+            raise
+        except RemotebitException:
+            metrics.errors += 1
+            raise
+        finally:
+            metrics.add(_time.perf_counter() - start, (len(request) + 2) * (self.transmissions - transmissions),
+                    self.bytes_received - bytes_received)
+            metrics.timeouts += self.timeouts - timeouts
+            if self.last_timing is not None:
+                metrics.device_time.add(self.last_timing[1] / 1e6)
+
+    def _send(self, request: str, confirm: bool, timeout: Optional[float]) -> None:
+        if _mb_unacknowledged and confirm and timeout is None:
+            self._send_unacknowledged(request)
+            return
+        if _mb_coalesce_bytes and confirm and timeout is None:
+            self._buffer(request)
+            return
+        exchange = self._exchange if _mb_metrics is None else self._measured_exchange
+        exchange(request, confirm, timeout, 0)
+        self._report_errors()
+
+    def _send_receive(self, request: str, timeout: Optional[float]) -> str:
+        retries = _mb_retries if request.partition(' ')[0] in _mb_idempotent_commands else 0
+        exchange = self._exchange if _mb_metrics is None else self._measured_exchange
+        reply = exchange(request, False, timeout, retries)
+        self._report_errors()
+        return reply
+
+    # The public calls reconnect when the micro:bit was disconnected
+
+    def send(self, request: str, confirm: bool = True, timeout: Optional[float] = None) -> None:
+        self._reconnecting(self._send, request, confirm, timeout)
+
+    def send_receive(self, request: str, timeout: Optional[float] = None) -> str:
+        return self._reconnecting(self._send_receive, request, timeout)
+
+    def flush(self) -> None:
+        """
+        Sends the buffered requests and checks their confirmations.
+        """
+        self._reconnecting(self._flush)
+
+    def sync(self) -> None:
+        self._reconnecting(self._sync)
+
+    def poll_events(self) -> None:
+        """
+        Processes the events received so far without waiting.
+        """
+        self._reconnecting(self._poll_events)
+
 
 class DebugLink:
     def __init__(self, path):
         pass
 
-    def send(self, request: str) -> None:
+    def send(self, request: str, confirm: bool = True, timeout: Optional[float] = None) -> None:
         print(request)
 
-    def send_receive(self, request: str) -> str:
+    def send_receive(self, request: str, timeout: Optional[float] = None) -> str:
         self.send(request)
         return input()
 
+    def poll_events(self) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def sync(self) -> None:
+        pass
+
+
+# Record and replay of the serial link sessions, e.g. to profile the host code
+# without a micro:bit: run the script with REMOTEBIT_RECORD=session.rec once,
+# then with REMOTEBIT_REPLAY=session.rec (and REMOTEBIT_REPLAY_PACE=1 to keep
+# the recorded timing).
+
+_MB_RECORD_MAGIC = b'RBREC001'
+# kind, call duration in seconds, request length, reply length
+_mb_record_header = _struct.Struct('<BdII')
+_MB_RECORD_REPLY = 0
+_MB_RECORD_ERROR = 1
+_MB_RECORD_TIMEOUT = 2
+
+
+class RecordingLink:
+    """
+    Passes the requests to the given link and records them with the replies
+    and the call durations.
+    """
+    def __init__(self, link, file):
+        self.link = link
+        self.file = file
+
+    def _record(self, kind: int, seconds: float, request: str, reply: str) -> None:
+        request_bytes = request.encode()
+        reply_bytes = reply.encode()
+        self.file.write(_mb_record_header.pack(kind, seconds, len(request_bytes), len(reply_bytes)))
+        self.file.write(request_bytes)
+        self.file.write(reply_bytes)
+
+    def _call(self, function, request: str, *args) -> str:
+        start = _time.perf_counter()
+        try:
+            reply = function(request, *args)
+        except RemotebitTimeout as e:
+            self._record(_MB_RECORD_TIMEOUT, _time.perf_counter() - start, request, str(e))
+            raise
+        except RemotebitException as e:
+            self._record(_MB_RECORD_ERROR, _time.perf_counter() - start, request, str(e))
+            raise
+        self._record(_MB_RECORD_REPLY, _time.perf_counter() - start, request, reply or '')
+        return reply
+
+    def send(self, request: str, confirm: bool = True, timeout: Optional[float] = None) -> None:
+        self._call(self.link.send, request, confirm, timeout)
+
+    def send_receive(self, request: str, timeout: Optional[float] = None) -> str:
+        return self._call(self.link.send_receive, request, timeout)
+
+    def poll_events(self) -> None:
+        self.link.poll_events()
+
+    def flush(self) -> None:
+        self.link.flush()
+
+    def sync(self) -> None:
+        self.link.sync()
+
+
+class ReplayLink:
+    """
+    Serves the replies recorded by RecordingLink, the script must send
+    the same requests in the same order.
+    """
+    def __init__(self, path: str, pace: bool = False):
+        self.pace = pace
+        self.records = []
+        self.index = 0
+        with open(path, 'rb') as f:
+            if f.read(len(_MB_RECORD_MAGIC)) != _MB_RECORD_MAGIC:
+                raise RemotebitException(f'remote-bit: {path} is not a recorded session.')
+            data = f.read()
+        offset = 0
+        while offset + _mb_record_header.size <= len(data):
+            kind, seconds, request_len, reply_len = _mb_record_header.unpack_from(data, offset)
+            offset += _mb_record_header.size
+            request = data[offset:offset + request_len].decode()
+            offset += request_len
+            reply = data[offset:offset + reply_len].decode()
+            offset += reply_len
+            self.records.append((kind, seconds, request, reply))
+
+    def _replay(self, request: str) -> str:
+        if self.index >= len(self.records):
+            _report_error(f'no more recorded replies for request {repr(request)}')
+        kind, seconds, recorded_request, reply = self.records[self.index]
+        self.index += 1
+        if request != recorded_request:
+            _report_error(f'request {repr(request)} does not match the recorded {repr(recorded_request)}')
+        if self.pace:
+            _time.sleep(seconds)
+        if kind == _MB_RECORD_TIMEOUT:
+            _report_error(reply, RemotebitTimeout)
+        elif kind == _MB_RECORD_ERROR:
+            _report_error(reply)
+        return reply
+
+    def send(self, request: str, confirm: bool = True, timeout: Optional[float] = None) -> None:
+        self._replay(request)
+
+    def send_receive(self, request: str, timeout: Optional[float] = None) -> str:
+        return self._replay(request)
+
+    def poll_events(self) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def sync(self) -> None:
+        pass
+
 
 def init_mb_link(path: str) -> None:
-    global _mb_link
+    global _mb_link, _mb_record_file
+    if 'REMOTEBIT_REPLAY' in _environ:
+        # a single replay link serves all the recorded requests in order
+        if not isinstance(_mb_link, ReplayLink):
+            _mb_link = ReplayLink(_environ['REMOTEBIT_REPLAY'],
+                    _environ.get('REMOTEBIT_REPLAY_PACE', '') == '1')
+        return
     try:
         _mb_link = SerialLink(path)
     except Exception as e:
         _mb_link = DebugLink('dummy')
         print(f'ERROR: Cannot connect to micro:bit ({str(e)}), '
                 'using debug link to the console.')
+    if 'REMOTEBIT_RECORD' in _environ:
+        if _mb_record_file is None:
+            _mb_record_file = open(_environ['REMOTEBIT_RECORD'], 'wb')
+            _mb_record_file.write(_MB_RECORD_MAGIC)
+            _atexit.register(_mb_record_file.close)
+        _mb_link = RecordingLink(_mb_link, _mb_record_file)
 
 
 init_mb_link(_mb_default_serial_name)
 
 
-def get_mb_link() -> Union[SerialLink, DebugLink]:
+def get_mb_link() -> Union[SerialLink, DebugLink, RecordingLink, ReplayLink]:
     return _mb_link
 
 
@@ -138,15 +1270,138 @@ def mb_from_bytes(bts: bytes) -> str:
     return mb_escape(' '.join([str(b) for b in bts]))
 
 
+# micro:bit clock synchronisation
+
+
+class _DeviceClock:
+    """
+    Estimates the micro:bit running_time() from the host clock, NTP style:
+    every sync sends a few running_time probes and keeps the one with
+    the shortest round trip, assuming the micro:bit read its clock half way.
+    The drift is the slope between the oldest and the newest kept sample.
+    """
+    PROBES = 5
+    MAX_SAMPLES = 8
+
+    def __init__(self, link, resync_interval: float):
+        self.link = link
+        self.resync_interval = resync_interval
+        # (host seconds, micro:bit ms, error ms)
+        self.samples = []
+        self.rate = 1.0
+        self.rate_error = 0.0
+        # the estimates never go back in time
+        self.last_ms = 0.0
+
+    def _probe(self) -> Tuple[float, float, float]:
+        best = None
+        for i in range(self.PROBES):
+            t0 = _time.perf_counter()
+            device_ms = int(self.link.send_receive('running_time'))
+            t1 = _time.perf_counter()
+            # running_time() is truncated to ms, thus +0.5 +-0.5
+            sample = ((t0 + t1) / 2, device_ms + 0.5, (t1 - t0) * 500 + 0.5)
+            if best is None or sample[2] < best[2]:
+                best = sample
+        return best
+
+    def sync(self) -> None:
+        sample = self._probe()
+        if self.samples:
+            predicted_ms, error_ms = self._estimate(sample[0])
+            if abs(sample[1] - predicted_ms) > 10 * (error_ms + sample[2]) + 5:
+                # the micro:bit has been reset
+                self._clear()
+        self.samples.append(sample)
+        del self.samples[:-self.MAX_SAMPLES]
+
+        first = self.samples[0]
+        span_s = sample[0] - first[0]
+        if span_s > 1:
+            self.rate = (sample[1] - first[1]) / (span_s * 1000)
+            self.rate_error = (sample[2] + first[2]) / (span_s * 1000)
+        else:
+            self.rate = 1.0
+            self.rate_error = 0.0
+
+    def _clear(self) -> None:
+        self.samples.clear()
+        self.last_ms = 0.0
+
+    def restart(self) -> None:
+        """
+        Discards the samples of the micro:bit clock before it was reset and syncs again.
+        """
+        self._clear()
+        self.sync()
+
+    def _estimate(self, host_s: float) -> Tuple[float, float]:
+        ref_host_s, ref_ms, ref_error_ms = self.samples[-1]
+        elapsed_ms = (host_s - ref_host_s) * 1000
+        return ref_ms + elapsed_ms * self.rate, ref_error_ms + abs(elapsed_ms) * self.rate_error
+
+    def now(self) -> Tuple[float, float]:
+        """
+        Returns the estimated micro:bit running_time() in ms and its error bound in ms.
+        """
+        host_s = _time.perf_counter()
+        if not self.samples or host_s - self.samples[-1][0] > self.resync_interval:
+            self.sync()
+            host_s = _time.perf_counter()
+        ms, error_ms = self._estimate(host_s)
+        if ms < self.last_ms:
+            ms = self.last_ms
+        self.last_ms = ms
+        return ms, error_ms
+
+
+def _restart_clock() -> None:
+    # the micro:bit was reset, its running_time() started again
+    if _mb_clock is not None and _mb_clock.link is _mb_link:
+        _mb_clock.restart()
+
+
+_mb_restore_hooks.append(_restart_clock)
+
+
+def set_clock_sync(on: bool, resync_interval: float = 10.0) -> None:
+    """
+    When on, running_time() and utime.ticks_*() estimate the micro:bit clock
+    locally instead of a round trip, the clock is resynchronised every
+    resync_interval seconds.
+    """
+    global _mb_clock
+    _mb_clock = _DeviceClock(_mb_link, resync_interval) if on else None
+
+
+def get_clock_error() -> float:
+    """
+    Returns the error bound of the running_time() estimate in ms, 0 if the clock sync is off.
+    """
+    return _mb_device_time_ms()[1] if _mb_clock is not None else 0.0
+
+
+def _mb_device_time_ms() -> Tuple[float, float]:
+    global _mb_clock
+    if _mb_clock.link is not _mb_link:
+        # init_mb_link has connected another micro:bit
+        _mb_clock = _DeviceClock(_mb_link, _mb_clock.resync_interval)
+    return _mb_clock.now()
+
+
 # micro:bit classes and functions
 
 
 def sleep(ms: int) -> None:
+    if _mb_coalesce_bytes:
+        _mb_link.flush()
     import time
     time.sleep(ms / 1000)
 
 
 def running_time() -> int:
+    if _mb_clock is not None:
+        return int(_mb_device_time_ms()[0])
     return int(_mb_link.send_receive('running_time'))
 
 
@@ -155,6 +1410,23 @@ def temperature() -> int:
 
 
 class Accelerometer:
+    def __init__(self):
+        # gesture state updated by the events, see set_event_mode
+        self._current_gesture = ''
+        self._gestures = []
+        self._was_gestures = set()
+
+    def _reset_events(self) -> None:
+        self._current_gesture = ''
+        self._gestures = []
+        self._was_gestures = set()
+
+    def _on_gesture_event(self, params: List[str]) -> None:
+        gesture = mb_unescape(params[0]) if params else ''
+        self._current_gesture = gesture
+        self._gestures.append(gesture)
+        self._was_gestures.add(gesture)
+
     def get_x(self) -> int:
         return int(_mb_link.send_receive('a.get_x'))
 
@@ -172,15 +1444,31 @@ class Accelerometer:
         """
         up, down, left, right, face up, face down, freefall, 3g, 6g, 8g, shake
         """
+        if _mb_events:
+            _mb_link.poll_events()
+            return self._current_gesture
         return _mb_link.send_receive('a.current_gesture')
 
     def is_gesture(self, gesture: str) -> bool:
+        if _mb_events:
+            _mb_link.poll_events()
+            return self._current_gesture == gesture
         return _mb_link.send_receive(f'a.is_gesture {mb_escape(gesture)}') == 'True'
 
     def was_gesture(self, gesture: str) -> bool:
+        if _mb_events:
+            _mb_link.poll_events()
+            was = gesture in self._was_gestures
+            self._was_gestures.discard(gesture)
+            return was
         return _mb_link.send_receive(f'a.was_gesture {mb_escape(gesture)}') == 'True'
 
     def get_gestures(self):
+        if _mb_events:
+            _mb_link.poll_events()
+            gestures = tuple(self._gestures)
+            self._gestures = []
+            return gestures
         return tuple(_mb_link.send_receive('a.get_gestures').split(' '))
 
 
@@ -874,42 +2162,216 @@ Image.ALL_CLOCKS = [Image.CLOCK12, Image.CLOCK1, Image.CLOCK2, Image.CLOCK3,
         Image.CLOCK9, Image.CLOCK10, Image.CLOCK11]
        
 
+class DisplayAnimation:
+    """
+    Non-blocking display.show or display.scroll, completed when the micro:bit
+    reports the end of the animation ('done'), or that another show, scroll or
+    clear replaced it ('cancelled'). The end of scroll is estimated for the
+    monospace font, so it may be reported a bit late.
+    """
+    _next_id = 0
+
+    def __init__(self) -> None:
+        self.id = DisplayAnimation._next_id
+        DisplayAnimation._next_id += 1
+        self.status = ''
+        _mb_animations[self.id] = self
+
+    def done(self) -> bool:
+        if not self.status:
+            _mb_link.poll_events()
+        return bool(self.status)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Returns False if the animation did not complete within the timeout in seconds.
+        """
+        deadline = None if timeout is None else _time.monotonic() + timeout
+        while not self.done():
+            if deadline is not None and _time.monotonic() > deadline:
+                return False
+            _time.sleep(0.01)
+        return True
+
+
+def _on_animation_event(params: List[str]) -> None:
+    animation = _mb_animations.pop(int(params[0]), None)
+    if animation:
+        animation.status = params[1]
+
+
+_mb_event_handlers['animation'] = _on_animation_event
+
+
+def _cancel_animations() -> None:
+    # the micro:bit was reset
+    for animation in _mb_animations.values():
+        animation.status = 'cancelled'
+    _mb_animations.clear()
+
+
+_mb_restore_hooks.append(_cancel_animations)
+
+
+class _Stream:
+    def __init__(self, credits: int) -> None:
+        # chunks the micro:bit can take without running out of memory
+        self.credits = credits
+        self.status = ''
+        self.error = ''
+
+    def wait(self, condition: Callable[[], bool], timeout: Optional[float]) -> None:
+        # the coalesced chunks must reach the micro:bit to return the credits,
+        # the timeout is restarted by every returned credit
+        _mb_link.flush()
+        credits = self.credits
+        deadline = None if timeout is None else _time.monotonic() + timeout
+        while not condition() and not self.status:
+            _mb_link.poll_events()
+            if self.credits != credits:
+                credits = self.credits
+                deadline = None if timeout is None else _time.monotonic() + timeout
+            elif deadline is not None and _time.monotonic() > deadline:
+                _report_error('no response from the micro:bit during the playback', RemotebitTimeout)
+            if not condition() and not self.status:
+                _time.sleep(0.002)
+        if self.status == 'cancelled':
+            _report_error('the micro:bit was reset during the playback')
+        elif self.status == 'error':
+            _report_error(f'{repr(self.error)} during the playback')
+
+
+def _mb_stream(start: str, chunks: Iterable[str], timeout: Optional[float] = None,
+        chunk_seconds: float = 0.0) -> None:
+    """
+    Plays the chunks on the micro:bit, which holds only a few of them at a time:
+    each played chunk returns a credit to send the next one, so the next chunks
+    arrive while the previous ones are played. Returns when the playback ends.
+    A credit is expected within the timeout set by set_timeout plus chunk_seconds,
+    the time to play the longest chunk.
+    """
+    global _mb_streaming
+    stream = _Stream(int(_mb_link.send_receive(start)))
+    # the recorded and debug sessions do not get the credits back
+    events = not isinstance(_mb_link, (DebugLink, ReplayLink))
+    wait_timeout = None if _mb_timeout is None else _mb_timeout + chunk_seconds
+    _mb_streaming = stream
+    try:
+        for chunk in chunks:
+            if events:
+                stream.wait(lambda: stream.credits > 0, wait_timeout)
+            stream.credits -= 1
+            _mb_link.send(f'stream.data {chunk}', timeout=timeout)
+        _mb_link.send('stream.end')
+        if events:
+            stream.wait(lambda: False, wait_timeout)
+    finally:
+        _mb_streaming = None
+
+
+def _on_stream_event(params: List[str]) -> None:
+    if _mb_streaming:
+        if params[0] == 'credit':
+            _mb_streaming.credits += 1
+        else:
+            _mb_streaming.status = params[0]
+            _mb_streaming.error = mb_unescape(params[1]) if len(params) > 1 else ''
+
+
+_mb_event_handlers['stream'] = _on_stream_event
+
+
+def _cancel_stream() -> None:
+    # the micro:bit was reset
+    if _mb_streaming:
+        _mb_streaming.status = 'cancelled'
+
+
+_mb_restore_hooks.append(_cancel_stream)
+
+
 class Display:
+    def __init__(self):
+        # the pixels known on the host, shown again when the micro:bit was reset,
+        # updated before the requests like the remembered state
+        self._pixels = [['0'] * 5 for y in range(5)]
+
+    def _restore(self) -> None:
+        self.show(Image(':'.join([''.join(row) for row in self._pixels])))
+
     def clear(self) -> None:
+        self._pixels = [['0'] * 5 for y in range(5)]
         _mb_link.send('display.clear')
 
     def set_pixel(self, x: int, y: int, b: int) -> None:
+        if 0 <= x < 5 and 0 <= y < 5:
+            self._pixels[y][x] = str(b)
         _mb_link.send(f'display.set_pixel {x} {y} {b}')
 
     def get_pixel(self, x: int, y: int) -> int:
         return int(_mb_link.send_receive(f'display.get_pixel {x} {y}'))
 
+    def _set_pixels(self, image: Image) -> None:
+        pixels = image._unpack(image.pixels_str)
+        self._pixels = [[(pixels[y][x] if y < len(pixels) and x < len(pixels[y]) else '0')
+                for x in range(5)] for y in range(5)]
+
     def show(self, value, delay: int = 400, *,
-            wait: bool = True, loop: bool = False, clear: bool = False) -> None:
+            wait: bool = True, loop: bool = False, clear: bool = False) -> Optional[DisplayAnimation]:
+        """
+        Returns a DisplayAnimation to poll or wait for when wait is False.
+        """
         value_type = ''
         if isinstance(value, Image):
             value_type = 'img'
+            self._set_pixels(value)
             value = value.pixels_str
         elif isinstance(value, str):
             value_type = 'str'
+            value = mb_escape(value)
         elif isinstance(value, int):
             value_type = 'int'
         elif isinstance(value, float):
             value_type = 'fp'
-
-        if value_type:
-            _mb_link.send(f'display.show {value_type} {value} {delay} {wait} {loop} {clear}')
         else:
+            # the frames of an animation: images and characters, shown by a single request
+            value_type = 'imgs'
+            frames = []
             for v in value:
-                self.show(v)
-
-    def scroll(self, s: str) -> None:
-        _mb_link.send(f'display.scroll {mb_escape(s)}')
+                if isinstance(v, Image):
+                    # the last frame stays on the display
+                    self._set_pixels(v)
+                    frames.append(v.pixels_str)
+                else:
+                    # escaped once, the commas separate the frames
+                    frames.extend([mb_escape(c).replace(',', '%2C') for c in str(v)])
+            value = ','.join(frames)
+
+        if clear:
+            self._pixels = [['0'] * 5 for y in range(5)]
+        animation = None if wait else DisplayAnimation()
+        _mb_link.send(f'display.show {value_type} {value} {delay} {wait} {loop} {clear}'
+                f'{"" if wait else " " + str(animation.id)}')
+        return animation
+
+    def scroll(self, text, delay: int = 150, *,
+            wait: bool = True, loop: bool = False, monospace: bool = False) -> Optional[DisplayAnimation]:
+        """
+        Returns a DisplayAnimation to poll or wait for when wait is False.
+        """
+        # the text scrolls out of the display
+        self._pixels = [['0'] * 5 for y in range(5)]
+        animation = None if wait else DisplayAnimation()
+        _mb_link.send(f'display.scroll {mb_escape(str(text))} {delay} {wait} {loop} {monospace}'
+                f'{"" if wait else " " + str(animation.id)}')
+        return animation
 
     def on(self) -> None:
+        _mb_remember('display.off', None)
         _mb_link.send('display.on')
 
     def off(self) -> None:
+        _mb_remember('display.off', 'display.off')
         _mb_link.send('display.off')
 
     def is_on(self) -> bool:
@@ -920,25 +2382,69 @@ class Display:
 
 
 display = Display()
+_mb_restore_hooks.append(display._restore)
 
 
 class Button:
     def __init__(self, button_name):
         self.button_name = button_name
+        # button state updated by the events, see set_event_mode
+        self._reset_events()
+
+    def _reset_events(self) -> None:
+        self._pressed = False
+        self._was_pressed = False
+        self._presses = 0
+
+    def _on_button_event(self, params: List[str]) -> None:
+        # pressed 0/1, number of presses since the previous event
+        self._pressed = params[1] == '1'
+        presses = int(params[2])
+        if presses:
+            self._presses += presses
+            self._was_pressed = True
 
     def is_pressed(self) -> bool:
+        if _mb_events:
+            _mb_link.poll_events()
+            return self._pressed
         return _mb_link.send_receive(f'button.is_pressed {self.button_name}') == 'True'
 
     def was_pressed(self) -> bool:
+        if _mb_events:
+            _mb_link.poll_events()
+            was_pressed = self._was_pressed
+            self._was_pressed = False
+            return was_pressed
         return _mb_link.send_receive(f'button.was_pressed {self.button_name}') == 'True'
 
     def get_presses(self) -> int:
+        if _mb_events:
+            _mb_link.poll_events()
+            presses = self._presses
+            self._presses = 0
+            return presses
         return int(_mb_link.send_receive(f'button.get_presses {self.button_name}'))
 
 
 button_a = Button('A')
 button_b = Button('B')
 
+_mb_event_handlers['button'] = lambda params: \
+        (button_a if params[0] == 'A' else button_b)._on_button_event(params)
+_mb_event_handlers['gesture'] = accelerometer._on_gesture_event
+
+
+def _on_fault_event(params: List[str]) -> str:
+    # the micro:bit stopped pushing the events, the host state would go stale
+    global _mb_events
+    _mb_events = False
+    _mb_remember('events', None)
+    return f'micro:bit failed while idle: {repr(mb_unescape(params[0]) if params else "")}, event mode is off'
+
+
+_mb_event_handlers['fault'] = _on_fault_event
+
 
 class AnalogPin:
     def __init__(self, pin):
@@ -1007,9 +2513,43 @@ def mb_pin_num(pin: Pin) -> int:
     return pins.index(pin)
 
 
+def _mb_wait_for(condition: str, timeout_ms: int) -> Optional[int]:
+    # the micro:bit replies once the condition fires or the timeout expires
+    timeout = None if _mb_timeout is None else _mb_timeout + timeout_ms / 1000
+    reply = _mb_link.send_receive(f'wait_for {condition} {timeout_ms}', timeout)
+    return int(reply) if reply else None
+
+
+def mb_wait_for_digital(pin: Pin, value: int = 1, timeout_ms: int = 10000) -> Optional[int]:
+    """
+    Waits on the micro:bit until the pin reads the value.
+    Returns the micro:bit utime.ticks_us() when it did or None on timeout.
+    """
+    return _mb_wait_for(f'digital {mb_pin_num(pin)} {value}', timeout_ms)
+
+
+def mb_wait_for_analog(pin: Pin, threshold: int, above: bool = True,
+        timeout_ms: int = 10000) -> Optional[int]:
+    """
+    Waits on the micro:bit until the pin reads above (or below) the threshold.
+    Returns the micro:bit utime.ticks_us() when it did or None on timeout.
+    """
+    return _mb_wait_for(f'{"above" if above else "below"} {mb_pin_num(pin)} {threshold}', timeout_ms)
+
+
+def mb_wait_for_button(button: Button, timeout_ms: int = 10000) -> Optional[int]:
+    """
+    Waits on the micro:bit until the button is pressed.
+    Returns the micro:bit utime.ticks_us() when it was or None on timeout.
+    """
+    return _mb_wait_for(f'button {button.button_name} 0', timeout_ms)
+
+
 class I2C:
     def init(self, freq: int = 100000, sda: Pin = pin20, scl: Pin = pin19) -> None:
-        _mb_link.send(f'i2c.init {freq} {mb_pin_num(sda)} {mb_pin_num(scl)}')
+        request = f'i2c.init {freq} {mb_pin_num(sda)} {mb_pin_num(scl)}'
+        _mb_remember('i2c.init', request)
+        _mb_link.send(request)
         
     def scan(self) -> List[int]:
         return [int(p) for p in _mb_link.send_receive('i2c.scan').split()]
@@ -1027,15 +2567,39 @@ i2c = I2C()
 class SPI:
     def init(self, baudrate: int = 1000000, bits: int = 8, mode: int = 0, \
             sclk: Pin = pin13, mosi: Pin = pin15, miso: Pin = pin14) -> None:
-        _mb_link.send(f'spi.init {baudrate} {bits} {mode} {mb_pin_num(sclk)} {mb_pin_num(mosi)} {mb_pin_num(miso)}')
+        request = f'spi.init {baudrate} {bits} {mode} {mb_pin_num(sclk)} {mb_pin_num(mosi)} {mb_pin_num(miso)}'
+        _mb_remember('spi.init', request)
+        _mb_link.send(request)
+
     def read(self, nbytes: int) -> bytes:
-        pass
+        data = bytearray()
+        size = _mb_chunk(_mb_max_chunk, _mb_payload_byte_cost)
+        for offset in range(0, nbytes, size):
+            n = min(size, nbytes - offset)
+            data += bytes.fromhex(_mb_link.send_receive(f'spi.read {n}'))
+        return bytes(data)
+
     def write(self, buffer: bytes) -> None:
-        pass
-    def write_readinto(self, out_buf: bytes, in_buf: bytes) -> None:
-        # TODO: handle the in/out buffers
-        # cannot find any example projects with SPI though - does it even make sense?
-        raise RemotebitException('remote-bit: spi.write_readinto() is not implemented.')
+        out_view = memoryview(buffer).cast('B')
+        size = _mb_chunk(_mb_max_chunk, _mb_payload_byte_cost)
+        for offset in range(0, len(out_view), size):
+            chunk = out_view[offset:offset + size]
+            _mb_link.send(f'spi.write {chunk.hex()}')
+
+    def write_readinto(self, out_buf: bytes, in_buf: bytearray) -> None:
+        """
+        in_buf can be any writable buffer, e.g. bytearray or memoryview,
+        the received bytes are stored in place.
+        """
+        out_view = memoryview(out_buf).cast('B')
+        in_view = memoryview(in_buf).cast('B')
+        if len(out_view) != len(in_view):
+            raise RemotebitException('remote-bit: spi.write_readinto() buffers must have the same length.')
+        size = _mb_chunk(_mb_max_chunk, _mb_payload_byte_cost)
+        for offset in range(0, len(out_view), size):
+            chunk = out_view[offset:offset + size]
+            response = _mb_link.send_receive(f'spi.write_readinto {chunk.hex()}')
+            in_view[offset:offset + len(chunk)] = bytes.fromhex(response)
 
 
 spi = SPI()
@@ -1054,9 +2618,11 @@ class UART:
 
 class Speaker:
     def on(self) -> None:
+        _mb_remember('speaker.off', None)
         _mb_link.send('speaker.on')
 
     def off(self) -> None:
+        _mb_remember('speaker.off', 'speaker.off')
         _mb_link.send('speaker.off')
 
 
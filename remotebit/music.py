@@ -5,26 +5,141 @@
 # https://github.com/voltur01/remotebit
 
 from microbit import *
+from microbit import _mb_chunk, _mb_remember, _mb_restore_hooks, _mb_stream
+from typing import List, Tuple
+import microbit as _microbit
+
+# Melodies uploaded to the micro:bit: note list -> melody id
+_melody_ids = {}
+_next_melody_id = 0
+_max_cached_melodies = 16
+# Number of notes uploaded per request
+_melody_chunk = 32
+# micro:bit heap bytes taken by a note in a request: the text, its split strings and the list item
+_note_cost = 48
+# Longer melodies are streamed rather than uploaded, see mb_play_streamed
+_max_uploaded_notes = 128
+
+# the micro:bit forgets the melodies when reset
+_mb_restore_hooks.append(_melody_ids.clear)
+
+# Semitones from C, 'r' is a rest
+_note_semitones = { 'c': 0, 'd': 2, 'e': 4, 'f': 5, 'g': 7, 'a': 9, 'b': 11, 'r': -100 }
 
 def set_tempo(ticks: int = 4, bpm: int = 120) -> None:
-    get_mb_link().send(f'music.set_tempo {ticks} {bpm}')
+    request = f'music.set_tempo {ticks} {bpm}'
+    _mb_remember('music.set_tempo', request)
+    get_mb_link().send(request)
 
 def get_tempo() -> int:
     ticks_bmp = get_mb_link().send_receive('music.get_tempo').split()
     return int(ticks_bmp[0]), int(ticks_bmp[1])
 
 def play(music, pin: Pin = pin0, wait: bool = True, loop: bool = False) -> None:
-    if not(isinstance(music, str)):
-        music = ' '.join(music)
-    get_mb_link().send(f'music.play {mb_escape(music)} {mb_pin_num(pin)} {wait} {loop}')
+    builtin_name = _builtin_melody_name(music)
+    if builtin_name:
+        get_mb_link().send(f'music.play_builtin {builtin_name} {mb_pin_num(pin)} {wait} {loop}')
+    elif wait and len(music.split() if isinstance(music, str) else music) > _max_uploaded_notes:
+        mb_play_streamed(music, pin, loop)
+    elif wait:
+        # background playback needs music.play on the micro:bit,
+        # thus only the blocking melodies can be cached
+        melody_id = _upload_melody(music)
+        get_mb_link().send(f'music.play_melody {melody_id} {mb_pin_num(pin)} {loop}')
+    else:
+        if not(isinstance(music, str)):
+            music = ' '.join(music)
+        get_mb_link().send(f'music.play {mb_escape(music)} {mb_pin_num(pin)} {wait} {loop}')
+
+def mb_play_streamed(music, pin: Pin = pin0, loop: bool = False) -> None:
+    """
+    Plays the melody sent in chunks while it is played, so that the micro:bit memory
+    use does not depend on the melody length, e.g. for long melodies on micro:bit v1.
+    Blocks until the melody ends.
+    """
+    compiled = mb_compile_melody(music)
+    size = _mb_chunk(_melody_chunk, _note_cost)
+    chunk_seconds = 0.0
+    if _microbit._mb_timeout is not None:
+        # a credit returns once a chunk was played
+        ticks, bpm = get_tempo()
+        chunk_seconds = max([sum([d for _, d in compiled[i:i + size]])
+                for i in range(0, len(compiled), size)], default=0) * 60 / (bpm * ticks)
+    while True:
+        _mb_stream(f'stream.start music {mb_pin_num(pin)}',
+                (' '.join([f'{f} {d}' for f, d in compiled[i:i + size]])
+                        for i in range(0, len(compiled), size)), chunk_seconds=chunk_seconds)
+        if not loop:
+            break
 
 def pitch(frequency:int, duration: int = -1, pin: Pin = pin0, wait: bool = True) -> None:
     get_mb_link().send(f'music.pitch {frequency} {duration} {mb_pin_num(pin)} {wait}')
 
+def mb_compile_melody(music) -> List[Tuple[int, int]]:
+    """
+    Converts the melody in the MicroPython notation, e.g. ['c4:4', 'e', 'g:8'],
+    to a list of (frequency in Hz, duration in ticks) pairs, rests have frequency 0.
+    """
+    if isinstance(music, str):
+        music = music.split()
+    octave = 4
+    duration = 4
+    compiled = []
+    for note in music:
+        name, _, note_duration = note.lower().partition(':')
+        if note_duration:
+            duration = int(note_duration)
+        rest = name[:1] == 'r'
+        semitone = _note_semitones.get(name[:1])
+        if semitone is None:
+            raise RemotebitException(f'remote-bit: music: incorrect note {repr(note)}.')
+        name = name[1:]
+        if name.startswith('#'):
+            semitone += 1
+            name = name[1:]
+        elif name.startswith('b'):
+            semitone -= 1
+            name = name[1:]
+        if name:
+            octave = int(name)
+        if rest:
+            compiled.append((0, duration))
+        else:
+            # cb is b of the octave below
+            compiled.append((round(440 * 2 ** (octave - 4 + (semitone - 9) / 12)), duration))
+    return compiled
+
+def _builtin_melody_name(music) -> str:
+    for name in _builtin_melodies:
+        if globals()[name] is music:
+            return name
+    return ''
+
+def _upload_melody(music) -> int:
+    global _next_melody_id
+    key = music if isinstance(music, str) else tuple(music)
+    melody_id = _melody_ids.get(key)
+    if melody_id is not None:
+        return melody_id
+
+    compiled = mb_compile_melody(music)
+    melody_id = _next_melody_id
+    _next_melody_id += 1
+    if len(_melody_ids) >= _max_cached_melodies:
+        evicted_key = next(iter(_melody_ids))
+        get_mb_link().send(f'music.forget {_melody_ids.pop(evicted_key)}')
+    size = _mb_chunk(_melody_chunk, _note_cost)
+    for i in range(0, max(len(compiled), 1), size):
+        values = ' '.join([f'{f} {d}' for f, d in compiled[i:i + size]])
+        get_mb_link().send(f'music.load {melody_id} {values}')
+    _melody_ids[key] = melody_id
+    return melody_id
+
 def stop(pin: Pin = pin0) -> None:
     get_mb_link().send(f'music.stop {mb_pin_num(pin)}')
 
 def reset() -> None:
+    _mb_remember('music.set_tempo', None)
     get_mb_link().send('music.reset')
 
 # These are the default melodies as provided by MicroPython, 
@@ -81,3 +196,7 @@ JUMP_DOWN = 'g5:1 f e d c'.split()
 POWER_UP = 'g4:1 c5 e g:2 e:1 g:3'.split()
 
 POWER_DOWN = 'g5:1 d# c g4:2 b:1 c5:3'.split()
+
+_builtin_melodies = ('DADADADUM', 'ENTERTAINER', 'PRELUDE', 'ODE', 'NYAN', 'RINGTONE',
+    'FUNK', 'BLUES', 'BIRTHDAY', 'WEDDING', 'FUNERAL', 'PUNCHLINE', 'PYTHON', 'BADDY',
+    'CHASE', 'BA_DING', 'WAWAWAWAA', 'JUMP_UP', 'JUMP_DOWN', 'POWER_UP', 'POWER_DOWN')
@@ -5,8 +5,91 @@
 # https://github.com/voltur01/remotebit
 
 from microbit import *
+from microbit import _mb_remember, _mb_restore_hooks
+from typing import Tuple
+
+# pin number -> NeoPixel, a new strip on a pin replaces the previous one
+_strips = {}
+
+def _restore_strips() -> None:
+    # the micro:bit was reset, show all the pixels again
+    for strip in _strips.values():
+        strip._mark_dirty(0, strip.n)
+        strip.show()
+
+_mb_restore_hooks.append(_restore_strips)
 
 class NeoPixel:
-    def __init__(self, pin: Pin, n: int) -> NeoPixel:
-        # TODO: handle remote stateful class
-        raise RemotebitException('remote-bit: NeoPixel() is not implemented.') 
+    """
+    The pixel buffer is kept on the host, so setting pixels does not
+    communicate with the micro:bit. show() sends the span of pixels changed
+    since the previous show() to the micro:bit in a single request.
+    The strips are identified by their pin on the micro:bit.
+    """
+    def __init__(self, pin: Pin, n: int, bpp: int = 3) -> None:
+        self.id = mb_pin_num(pin)
+        self.n = n
+        self.bpp = bpp
+        self.buf = bytearray(n * bpp)
+        self._dirty_begin = n
+        self._dirty_end = 0
+        request = f'neopixel.init {self.id} {n} {bpp}'
+        _mb_remember(f'neopixel {self.id}', request)
+        _strips[self.id] = self
+        get_mb_link().send(request)
+
+    def _check_replaced(self) -> None:
+        # the micro:bit sends the pixels to the strip created last on the pin
+        if _strips.get(self.id) is not self:
+            raise RemotebitException('remote-bit: NeoPixel replaced by a new strip on the same pin.')
+
+    def _mark_dirty(self, begin: int, end: int) -> None:
+        self._dirty_begin = min(self._dirty_begin, begin)
+        self._dirty_end = max(self._dirty_end, end)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __setitem__(self, index: int, colour: Tuple[int, ...]) -> None:
+        if index < 0:
+            index += self.n
+        if not(0 <= index < self.n):
+            raise IndexError('remote-bit: NeoPixel index out of range.')
+        if len(colour) != self.bpp:
+            raise ValueError(f'remote-bit: NeoPixel colour must have {self.bpp} values.')
+        offset = index * self.bpp
+        self.buf[offset:offset + self.bpp] = bytes(colour)
+        self._mark_dirty(index, index + 1)
+
+    def __getitem__(self, index: int) -> Tuple[int, ...]:
+        if index < 0:
+            index += self.n
+        if not(0 <= index < self.n):
+            raise IndexError('remote-bit: NeoPixel index out of range.')
+        offset = index * self.bpp
+        return tuple(self.buf[offset:offset + self.bpp])
+
+    def fill(self, colour: Tuple[int, ...]) -> None:
+        if len(colour) != self.bpp:
+            raise ValueError(f'remote-bit: NeoPixel colour must have {self.bpp} values.')
+        self.buf[:] = bytes(colour) * self.n
+        self._mark_dirty(0, self.n)
+
+    def clear(self) -> None:
+        self._check_replaced()
+        self.buf[:] = bytes(len(self.buf))
+        self._dirty_begin = self.n
+        self._dirty_end = 0
+        get_mb_link().send(f'neopixel.clear {self.id}')
+
+    def show(self) -> None:
+        self._check_replaced()
+        if self._dirty_begin >= self._dirty_end:
+            return
+        span = memoryview(self.buf)[self._dirty_begin * self.bpp:self._dirty_end * self.bpp]
+        get_mb_link().send(f'neopixel.show {self.id} {self._dirty_begin} {span.hex()}')
+        self._dirty_begin = self.n
+        self._dirty_end = 0
+
+    def write(self) -> None:
+        self.show()
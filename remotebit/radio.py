@@ -5,12 +5,15 @@
 # https://github.com/voltur01/remotebit
 
 from microbit import *
+from microbit import _mb_remember
 from typing import Tuple
 
 def on() -> None:
+    _mb_remember('radio.on', 'radio.on')
     get_mb_link().send('radio.on')
 
 def off() -> None:
+    _mb_remember('radio.on', None)
     get_mb_link().send('radio.off')
 
 def config(**kwargs) -> None:
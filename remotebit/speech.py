@@ -5,9 +5,65 @@
 # https://github.com/voltur01/remotebit
 
 from microbit import *
+from microbit import _mb_chunk, _mb_stream
+from typing import Iterator
+import microbit as _microbit
+from collections import OrderedDict
+from os import replace as _os_replace
+import json
 
-def translate(words: str) -> None:
-    return mb_unescape(get_mb_link().send_receive(f'speech.translate {mb_escape(words)}'))
+# translate() results: words -> phonemes, the least recently used first
+_translations = OrderedDict()
+_max_translations = 256
+_translations_path = ''
+# Longer texts are streamed, see mb_say_streamed
+_max_said_chars = 120
+# Characters per streamed chunk and the time to say one
+_speech_chunk = 60
+_speech_chunk_seconds = 6
+# micro:bit heap bytes taken by a character: the text, its translation and the speech buffers
+_char_cost = 8
+
+def mb_set_translation_cache(path: str = '', max_size: int = 256) -> None:
+    """
+    Limits the number of cached translations and, if the path is given,
+    loads the cache from the file and saves it back on every new translation.
+    """
+    global _max_translations, _translations_path
+    _max_translations = max_size
+    _translations_path = path
+    if path:
+        try:
+            with open(path) as f:
+                _translations.update(json.load(f))
+        except FileNotFoundError:
+            pass
+    while len(_translations) > _max_translations:
+        _translations.popitem(last=False)
+
+def _cached_translation(words: str) -> str:
+    phonemes = _translations.get(words)
+    if phonemes is not None:
+        _translations.move_to_end(words)
+    return phonemes
+
+def _cache_translation(words: str, phonemes: str) -> None:
+    _translations[words] = phonemes
+    _translations.move_to_end(words)
+    while len(_translations) > _max_translations:
+        _translations.popitem(last=False)
+    if _translations_path:
+        tmp_path = _translations_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(_translations, f)
+        _os_replace(tmp_path, _translations_path)
+
+def translate(words: str) -> str:
+    phonemes = _cached_translation(words)
+    if phonemes is None:
+        phonemes = mb_unescape(get_mb_link().send_receive(f'speech.translate {mb_escape(words)}'))
+        _cache_translation(words, phonemes)
+    return phonemes
 
 def pronounce(phonemes: str, *, \
         pitch: int = 64, speed: int = 72, mouth: int = 128, throat: int = 128) -> None:
@@ -15,7 +71,44 @@ def pronounce(phonemes: str, *, \
 
 def say(words: str, *, \
         pitch: int = 64, speed: int = 72, mouth: int = 128, throat: int = 128) -> None:
-    get_mb_link().send(f'speech.say {mb_escape(words)} {pitch} {speed} {mouth} {throat}')
+    if len(words) > _max_said_chars:
+        mb_say_streamed(words, pitch=pitch, speed=speed, mouth=mouth, throat=throat)
+        return
+    phonemes = _cached_translation(words)
+    if phonemes is not None:
+        pronounce(phonemes, pitch=pitch, speed=speed, mouth=mouth, throat=throat)
+    else:
+        # the micro:bit replies with the phonemes it has translated the words to
+        phonemes = get_mb_link().send_receive(f'speech.say {mb_escape(words)} {pitch} {speed} {mouth} {throat}')
+        _cache_translation(words, mb_unescape(phonemes))
+
+def _split_words(words: str, size: int) -> Iterator[str]:
+    # at the sentence ends if possible, otherwise between the words
+    chunk = ''
+    for word in words.split():
+        if chunk and len(chunk) + len(word) >= size:
+            yield chunk
+            chunk = ''
+        chunk = f'{chunk} {word}' if chunk else word
+        if word[-1] in '.!?;' and len(chunk) >= size // 2:
+            yield chunk
+            chunk = ''
+    if chunk:
+        yield chunk
+
+def mb_say_streamed(words: str, *, \
+        pitch: int = 64, speed: int = 72, mouth: int = 128, throat: int = 128) -> None:
+    """
+    Says the text sent in chunks while it is said, so that the micro:bit memory
+    use does not depend on the text length. Blocks until the text is said.
+    """
+    # the micro:bit confirms a chunk after saying the current one
+    timeout = _microbit._mb_timeout
+    if timeout is not None:
+        timeout += _speech_chunk_seconds
+    _mb_stream(f'stream.start speech {pitch} {speed} {mouth} {throat}',
+            (mb_escape(chunk) for chunk in _split_words(words, _mb_chunk(_speech_chunk, _char_cost))),
+            timeout, _speech_chunk_seconds)
 
 def sing(phonemes: str, *, \
         pitch: int = 64, speed: int = 72, mouth: int = 128, throat: int = 128) -> None:
@@ -4,18 +4,29 @@
 # remote:bit is a remote Python execution library for BBC micro:bit
 # https://github.com/voltur01/remotebit
 
+# When the clock sync is on (see microbit.set_clock_sync) the ticks are
+# the estimate of the micro:bit clock, otherwise the host clock.
+
+from microbit import _mb_device_time_ms
+import microbit as _microbit
 import time
 
+# like microbit.sleep, sending the coalesced writes first
+
 def sleep_ms(ms: int) -> None:
-    time.sleep(ms / 1000)
+    _microbit.sleep(ms)
 
 def sleep_us(us: int) -> None:
-    time.sleep(us / 1000000)
+    _microbit.sleep(us / 1000)
 
 def ticks_ms() -> int:
+    if _microbit._mb_clock is not None:
+        return int(_mb_device_time_ms()[0])
     return round(time.time() * 1000)
 
 def ticks_us() -> int:
+    if _microbit._mb_clock is not None:
+        return int(_mb_device_time_ms()[0] * 1000)
     return round(time.time() * 1000000)
 
 def ticks_add(ticks: int, delta: int) -> int:
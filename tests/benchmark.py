@@ -6,18 +6,210 @@
 # remote:bit -> ~140 reads/sec
 # real micro:bit native -> ~3600 read/sec, i.e. 25 faster
 
+# Usage:
+#   python3 benchmark.py [--port PATH] [--iterations N] [--only NAME,...]
+#                        [--output results.json] [--baseline baseline.json] [--threshold 0.2]
+#
+# --port connects to the given serial port instead of the default one,
+# e.g. the pseudo terminal of a simulated micro:bit.
+# --baseline compares the results to the saved ones and exits with 1
+# if any benchmark is slower by more than the threshold.
+
+import argparse
+import json
+import sys
+import time
+
 # pylint: disable=unused-wildcard-import
-from microbit import * 
-from utime import *
+from microbit import *
+import music
+import radio
+import speech
+
+def bench_pin_read_analog():
+    pin0.read_analog()
+
+def bench_pin_read_digital():
+    pin1.read_digital()
+
+def bench_pin_write_digital():
+    pin1.write_digital(1)
+
+def bench_button_is_pressed():
+    button_a.is_pressed()
+
+def bench_button_was_pressed():
+    button_a.was_pressed()
+
+def bench_display_set_pixel():
+    display.set_pixel(2, 2, 9)
+
+def bench_display_get_pixel():
+    display.get_pixel(2, 2)
+
+def bench_display_show_image():
+    display.show(Image.HEART)
+
+def bench_display_scroll():
+    display.scroll('.')
+
+def bench_image_ops():
+    Image.HEART.shift_left(1).invert().crop(0, 0, 3, 3)
+
+def bench_music_pitch():
+    music.pitch(440, 1)
+
+def bench_music_play():
+    music.play(['c5:1'])
+
+def bench_radio_send():
+    radio.send('hello')
+
+def bench_radio_receive():
+    radio.receive()
+
+def bench_i2c_scan():
+    i2c.scan()
+
+def bench_accelerometer_get_x():
+    accelerometer.get_x()
+
+def bench_accelerometer_get_values():
+    accelerometer.get_values()
+
+def bench_compass_get_x():
+    compass.get_x()
+
+def bench_speech_translate():
+    speech._translations.clear()   # measure the micro:bit translation, not the cache
+    speech.translate('hello')
+
+def bench_speech_translate_cached():
+    speech.translate('hello')
+
+def setup_radio():
+    radio.on()
+
+def setup_display():
+    display.on()
+
+# name -> (function, setup function, iterations relative to --iterations)
+benchmarks = {
+    'pin.read_analog': (bench_pin_read_analog, setup_display, 1),
+    'pin.read_digital': (bench_pin_read_digital, None, 1),
+    'pin.write_digital': (bench_pin_write_digital, None, 1),
+    'button.is_pressed': (bench_button_is_pressed, None, 1),
+    'button.was_pressed': (bench_button_was_pressed, None, 1),
+    'display.set_pixel': (bench_display_set_pixel, setup_display, 1),
+    'display.get_pixel': (bench_display_get_pixel, setup_display, 1),
+    'display.show': (bench_display_show_image, setup_display, 1),
+    'display.scroll': (bench_display_scroll, setup_display, 0.02),
+    'image.ops': (bench_image_ops, None, 1),
+    'music.pitch': (bench_music_pitch, None, 0.2),
+    'music.play': (bench_music_play, None, 0.2),
+    'radio.send': (bench_radio_send, setup_radio, 1),
+    'radio.receive': (bench_radio_receive, setup_radio, 1),
+    'i2c.scan': (bench_i2c_scan, None, 0.1),
+    'accelerometer.get_x': (bench_accelerometer_get_x, None, 1),
+    'accelerometer.get_values': (bench_accelerometer_get_values, None, 1),
+    'compass.get_x': (bench_compass_get_x, None, 1),
+    'speech.translate': (bench_speech_translate, None, 0.1),
+    'speech.translate_cached': (bench_speech_translate_cached, None, 1),
+}
+
+def percentile(sorted_samples, p):
+    return sorted_samples[min(int(p / 100 * len(sorted_samples)), len(sorted_samples) - 1)]
+
+def run_benchmark(function, setup, iterations):
+    if setup:
+        setup()
+    function()  # warm up, e.g. fill the caches
+
+    reset_metrics()
+    samples = []
+    t_begin = time.perf_counter()
+    cpu_begin = time.process_time()
+    for i in range(iterations):
+        t_op = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - t_op)
+    total = time.perf_counter() - t_begin
+    cpu = time.process_time() - cpu_begin
+
+    metrics = get_metrics()
+    bytes_sent = sum([m['bytes_sent'] for m in metrics.values()])
+    bytes_received = sum([m['bytes_received'] for m in metrics.values()])
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'ops_per_sec': iterations / total,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'host_cpu_us_per_op': cpu / iterations * 1000000,
+        'bytes_sent_per_op': bytes_sent / iterations,
+        'bytes_received_per_op': bytes_received / iterations,
+    }
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or 'ops_per_sec' not in result or 'ops_per_sec' not in base:
+            continue
+        change = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        flag = ''
+        if change < -threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'{name:28} {base["ops_per_sec"]:10.1f} -> {result["ops_per_sec"]:10.1f} ops/sec '
+              f'({change:+.1%}){flag}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='remote:bit benchmarks')
+    parser.add_argument('--port', help='serial port of the micro:bit')
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--only', help='comma separated benchmark names')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    parser.add_argument('--baseline', help='JSON file with the results to compare to')
+    parser.add_argument('--threshold', type=float, default=0.2,
+            help='relative ops/sec drop reported as a regression')
+    args = parser.parse_args()
+
+    if args.port:
+        init_mb_link(args.port)
+    set_raise(True)
+    set_metrics(True)
 
-iterations = 1000
+    names = args.only.split(',') if args.only else list(benchmarks)
+    results = {}
+    for name in names:
+        function, setup, scale = benchmarks[name]
+        iterations = max(int(args.iterations * scale), 1)
+        try:
+            results[name] = run_benchmark(function, setup, iterations)
+        except RemotebitException as e:
+            # e.g. not supported by micro:bit v1
+            results[name] = {'error': str(e)}
+            print(f'{name:28} ERROR: {str(e)}')
+            continue
+        r = results[name]
+        print(f'{name:28} {r["ops_per_sec"]:10.1f} ops/sec  p50 {r["p50_ms"]:7.2f} ms  '
+              f'p95 {r["p95_ms"]:7.2f} ms  p99 {r["p99_ms"]:7.2f} ms  '
+              f'cpu {r["host_cpu_us_per_op"]:6.0f} us/op  '
+              f'{r["bytes_sent_per_op"] + r["bytes_received_per_op"]:6.1f} bytes/op')
 
-t_begin = ticks_ms()
-for i in range(iterations):
-    v = pin0.read_analog()
-t_end = ticks_ms()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
 
-diff_ms = ticks_diff(t_end, t_begin)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
 
-print('ms: ' + str(diff_ms))
-print('ops / sec: ' + str(iterations / diff_ms * 1000))
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+from testing_utils import *
+
+from microbit import *
+import os
+import re
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'microbit_app'))
+import mb_build_app
+
+script_path = os.path.join(tempfile.mkdtemp(), 'script.py')
+with open(script_path, 'w') as f:
+    f.write('from microbit import *\n'
+            'display.set_pixel(0, 0, pin0.read_analog() // 114)\n')
+with open(os.path.join(os.path.dirname(mb_build_app.__file__), 'microbit_app.py')) as f:
+    source = f.read()
+commands = {command for command, _ in mb_build_app.split_app(source)[1]}
+needed, weights = mb_build_app.scan(script_path, commands)
+check({'display.set_pixel', 'pin.read_analog', 'sync', 'hello'} <= needed, 'the used requests should be kept')
+check('rule.add' not in needed and 'pin.write_digital' not in needed, 'the unused requests should be trimmed')
+
+app = mb_build_app.build(source, needed, weights)
+compile(app, 'app.py', 'exec')
+check("cmd == 'manifest'" in app, 'the application should have a manifest')
+check('def run_rules' not in app and 'def run_log' not in app, 'the unused idle loop steps should be removed')
+manifest = re.search(r"elif cmd == 'manifest':\n +print\('([^']*)'\)", app).group(1).split()
+check('pin.read_analog' in manifest and 'rule.add' not in manifest, 'wrong manifest')
+
+# the host rejects the requests the application does not handle, once it has the manifest
+pin0.read_analog()
+link = get_mb_link()
+link.commands = set(manifest)
+set_raise(True)
+try:
+    pin0.write_digital(1)
+    check(False, 'a request not in the manifest should be rejected')
+except RemotebitException:
+    pass
+set_raise(False)
+link.commands = None
+pin0.read_analog()
@@ -12,3 +12,13 @@ check(button_a.get_presses() == 0, 'button A presses should be 0')
 check(button_b.is_pressed() == False, 'button B should not be pressed')
 check(button_b.was_pressed() == False, 'button B was not be pressed')
 check(button_b.get_presses() == 0, 'button B presses should be 0')
+
+# the same with the events pushed by micro:bit, answered without round trips
+set_event_mode(True)
+check(button_a.is_pressed() == False, 'button A should not be pressed, events')
+check(button_a.was_pressed() == False, 'button A was not be pressed, events')
+check(button_a.get_presses() == 0, 'button A presses should be 0, events')
+check(button_b.is_pressed() == False, 'button B should not be pressed, events')
+check(pin0.read_digital() in (0, 1), 'requests should work in the event mode')
+set_event_mode(False)
+check(button_a.get_presses() == 0, 'button A presses should be 0 after the events')
@@ -40,3 +40,22 @@ display.show(123)
 display.show(4.5)
 display.show("hi")
 display.show(Image.ALL_CLOCKS)
+
+display.scroll('hi there', 50)
+animation = display.scroll('hi', 50, wait=False)
+check(animation is not None, 'non-blocking scroll should return an animation')
+check(animation.wait(5), 'non-blocking scroll should complete')
+check(animation.status == 'done', 'scroll should be done')
+animation = display.show('abc', 100, wait=False, loop=True)
+display.clear()
+check(animation.wait(1) and animation.status == 'cancelled', 'clear should cancel the animation')
+animation = display.show(Image.ALL_CLOCKS[:3], 100, wait=False, loop=True)
+check(animation is not None and not animation.done(), 'non-blocking image animation should return an animation')
+display.clear()
+check(animation.wait(1) and animation.status == 'cancelled', 'clear should cancel the image animation')
+display.show(['a', Image.HEART], 50)
+check(display.get_pixel(1, 0) == 9, 'the last image should stay on the display')
+display.show([' ', '%', ',', Image.HEART], 10)
+check(display.get_pixel(1, 0) == 9, 'the escaped characters should be shown as frames')
+display.show(['%', ' '], 10)
+check(display.get_pixel(2, 2) == 0, 'the frames should be unescaped once')
@@ -0,0 +1,23 @@
+#!/bin/bash
+
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+# Runs the tests and the benchmark against the micro:bit emulator, e.g. in CI.
+# The arguments are passed to the emulator, e.g. --latency 2
+
+LINK=/tmp/remotebit_emulator_$$
+
+python3 ../emulator/mb_emulator.py --link $LINK "$@" &
+EMULATOR_PID=$!
+trap 'kill $EMULATOR_PID' EXIT
+
+while [ ! -e $LINK ]; do sleep 0.1; done
+
+export REMOTEBIT_SERIAL=$LINK
+# lets the tests reset the emulated micro:bit
+export REMOTEBIT_EMULATOR_PID=$EMULATOR_PID
+export PYTHONPATH=`pwd`/../remotebit:$PYTHONPATH
+
+./test_all.sh
+python3 benchmark.py --iterations 100
@@ -0,0 +1,49 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+from testing_utils import *
+
+from microbit import *
+from mb_logger import SensorLogger, read_log_file
+import os
+import tempfile
+
+path = os.path.join(tempfile.mkdtemp(), 'log.npy')
+logger = SensorLogger(path, [pin0.read_analog, accelerometer.get_x, button_a.is_pressed], 5,
+        records_per_file=50, sync_records=10)
+logger.run(1)
+display.set_pixel(0, 0, 9)     # the samples arrive during the requests as well
+logger.run(0.2)
+logger.stop()
+check(logger.count > 100, 'too few samples logged')
+check(len(logger.files) == (logger.count + 49) // 50, 'the files should be rotated')
+
+names, records = read_log_file(logger.files[0])
+records = list(records)
+check(names == ['t_us', 'pin.read_analog_0', 'a.get_x', 'button.is_pressed_A'], 'wrong logged names')
+check(len(records) == 50, 'wrong number of records in a rotated file')
+check(all(records[i][0] < records[i + 1][0] for i in range(len(records) - 1)), 'the time should increase')
+check(3000 < (records[-1][0] - records[0][0]) / 49 < 20000, 'wrong sampling interval')
+names, records = read_log_file(logger.files[-1])
+check(len(list(records)) == logger.count - 50 * (len(logger.files) - 1), 'wrong number of records in the last file')
+
+try:
+    import numpy
+    data = numpy.load(logger.files[0], mmap_mode='r')
+    check(data['a.get_x'].shape == (50,), 'the log should be readable by numpy')
+except ImportError:
+    pass
+
+# a failing source stops the logging, the link stays usable
+set_raise(True)
+logger = SensorLogger(path, [pin3.is_touched])
+try:
+    logger.run(0.2)
+    check(False, 'a failing source should be reported')
+except RemotebitException:
+    pass
+set_raise(False)
+check(logger.error is not None, 'the logging error should be kept')
+pin0.read_analog()
+logger.stop()
+display.clear()
@@ -4,6 +4,87 @@
 from testing_utils import *
 
 from microbit import *
+import music
 
 rt = running_time()
 t = temperature()
+
+set_device_timing(True)
+t = temperature()
+check(get_last_timing() is not None, 'micro:bit should report the timing')
+set_device_timing(False)
+
+set_write_coalescing(True)
+for x in range(5):
+    display.set_pixel(x, 2, 9)
+check(display.get_pixel(4, 2) == 9, 'coalesced writes should be sent before a read')
+display.set_pixel(0, 0, 5)
+sleep(10)
+check(display.get_pixel(0, 0) == 5, 'coalesced writes should be sent at sleep')
+set_write_coalescing(False)
+display.clear()
+
+with mb_unacknowledged():
+    for x in range(5):
+        display.set_pixel(x, 3, 9)
+sync()
+check(display.get_pixel(4, 3) == 9, 'unacknowledged writes should be executed')
+set_raise(True)
+try:
+    with mb_unacknowledged():
+        display.set_pixel(9, 9, 9)
+    sync()
+    check(False, 'unacknowledged error should be reported by sync()')
+except RemotebitException:
+    pass
+set_raise(False)
+display.clear()
+
+telemetry = get_telemetry()
+check(telemetry['mem_free'] > 0 and telemetry['commands'] > 0, 'wrong telemetry')
+check(telemetry['exceptions'] >= 1, 'telemetry should count the exceptions')
+set_telemetry(True, 0)
+running_time()
+check(get_device_metrics()['samples'] == 1, 'telemetry should be sampled after a request')
+check(get_device_metrics()['min_mem_free'] <= telemetry['mem_free'] + 1024, 'wrong lowest free memory')
+set_telemetry(False)
+check(get_device_metrics() == {}, 'telemetry should be off')
+
+set_metrics(True)
+reset_metrics()
+for i in range(3):
+    pin0.read_analog()
+metrics = get_metrics()['pin.read_analog']
+check(metrics['count'] == 3 and metrics['errors'] == 0, 'wrong number of calls in the metrics')
+request_bytes = metrics['bytes_sent'] // 3
+check(metrics['bytes_received'] > 0 and metrics['p50_ms'] > 0, 'wrong metrics')
+reset_metrics()
+check(get_metrics() == {}, 'the metrics should be reset')
+# a read waiting behind a blocking request times out and is sent again
+with mb_unacknowledged():
+    music.pitch(440, 500)
+with mb_timeout(0.2):
+    pin0.read_analog()
+metrics = get_metrics()['pin.read_analog']
+check(metrics['timeouts'] == 1 and metrics['count'] == 1, 'the timeout should be counted')
+check(metrics['bytes_sent'] == 2 * request_bytes, 'the repeated request should be counted')
+set_metrics(False)
+check(get_metrics() == {}, 'the metrics should be off')
+
+# a read waiting behind a blocking request times out, the link resyncs and repeats it
+timeouts = get_mb_link().timeouts
+with mb_unacknowledged():
+    music.pitch(440, 500)
+with mb_timeout(0.2):
+    pin0.read_analog()
+check(get_mb_link().timeouts == timeouts + 1, 'the read should time out once and be repeated')
+set_raise(True)
+try:
+    with mb_timeout(0.2):
+        music.pitch(440, 500)
+    check(False, 'a blocking request should time out')
+except RemotebitTimeout:
+    pass
+set_raise(False)
+# the link is in sync again
+pin0.read_analog()
@@ -10,7 +10,18 @@ music.set_tempo(5, 130)
 t = music.get_tempo()
 music.play('c4')
 music.play(['c', 'd', 'e'])
+music.play(['c', 'd', 'e'])     # cached on the micro:bit
+music.play(['c', 'd', 'e'], wait=False)
+check(music.mb_compile_melody(['a4:2', 'r', 'c5', 'cb4']) == [(440, 2), (0, 2), (523, 2), (247, 2)],
+        'wrong compiled melody')
 music.pitch(500)
+
+# streamed while played, 200 notes of 12 ms
+music.set_tempo(4, 1200)
+t_start = running_time()
+music.play(['c:1', 'e', 'g', 'r'] * 50)
+check(running_time() - t_start >= 2000, 'streamed melody ended too early')
+music.mb_play_streamed(['c:1', 'e'])
 music.stop()
 music.reset()
 
@@ -0,0 +1,32 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+from testing_utils import *
+
+from microbit import *
+import neopixel
+
+np = neopixel.NeoPixel(pin0, 8)
+check(len(np) == 8, 'wrong number of pixels')
+np[0] = (255, 0, 0)
+np[7] = (0, 0, 255)
+check(np[7] == (0, 0, 255), 'pixel value should be kept on the host')
+np.show()
+np.show()   # nothing changed, no request expected
+np.fill((0, 16, 0))
+np.show()
+np.clear()
+
+# a new strip on the same pin replaces the previous one
+import microbit as _microbit
+hooks = len(_microbit._mb_restore_hooks)
+replaced = np
+np = neopixel.NeoPixel(pin0, 4)
+check(len(_microbit._mb_restore_hooks) == hooks, 'a strip should not add a restore hook')
+check(list(neopixel._strips.values()) == [np], 'the replaced strip should be dropped')
+try:
+    replaced.show()
+    check(False, 'the replaced strip should not be shown')
+except RemotebitException:
+    pass
+np.clear()
@@ -31,3 +31,8 @@ pin0.set_analog_period(1)
 pin0.set_analog_period_microseconds(2500)
 
 display.on()
+
+# wait on the micro:bit, analog values are always within 0..1023
+check(mb_wait_for_analog(pin1, 1024, above=False, timeout_ms=100) is not None, 'pin 1 should be below 1024')
+check(mb_wait_for_analog(pin1, 1023, timeout_ms=100) is None, 'waiting for pin 1 above 1023 should time out')
+check(mb_wait_for_button(button_a, timeout_ms=100) is None, 'button A should not be pressed')
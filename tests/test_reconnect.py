@@ -0,0 +1,68 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+from testing_utils import *
+
+from microbit import *
+from mb_trace import *
+import music
+import os
+import signal
+import threading
+
+display.set_pixel(0, 0, 7)
+# the next call reopens a closed port
+get_mb_link().port.close()
+check(display.get_pixel(0, 0) == 7, 'the link should reconnect')
+
+# a write that reached the micro:bit before a disconnect is not repeated
+port = get_mb_link().port
+port_write = port.write
+def write_and_disconnect(data):
+    port_write(data)
+    raise OSError('disconnected')
+port.write = write_and_disconnect
+records = []
+add_trace_hook(records.append)
+display.set_pixel(2, 2, 3)
+remove_trace_hook(records.append)
+sent = [r for r in records if r.kind == 'request' and r.command == 'display.set_pixel' and r.data == '2 2 3']
+check(len(sent) == 1, 'a write should not be repeated after a reconnect')
+check(display.get_pixel(2, 2) == 3, 'the state should be restored after a reconnect')
+
+# tests/test_emulated.sh passes the emulator to reset
+emulator_pid = os.environ.get('REMOTEBIT_EMULATOR_PID')
+if emulator_pid:
+    reset = lambda: os.kill(int(emulator_pid), signal.SIGUSR1)
+    # changed behind the host, the reset micro:bit gets the host state back
+    get_mb_link().send('display.set_pixel 0 0 0')
+    reset()
+    sleep(200)
+    check(display.get_pixel(0, 0) == 7, 'the state should be restored after a reset')
+    # a write after a reset while idle carries on
+    reset()
+    sleep(200)
+    display.set_pixel(1, 1, 5)
+    check(display.get_pixel(1, 1) == 5, 'a write after a reset should be executed')
+    check(display.get_pixel(0, 0) == 7, 'the state should be restored before a write')
+
+    # the clock estimate starts again with the micro:bit clock
+    set_clock_sync(True)
+    running_time()
+    sleep(1000)
+    reset()
+    sleep(200)
+    display.get_pixel(0, 0)
+    check(running_time() < 900, 'the clock should be synced again after a reset')
+    set_clock_sync(False)
+
+    threading.Timer(0.3, reset).start()
+    set_raise(True)
+    try:
+        music.pitch(440, 3000)
+        check(False, 'a request interrupted by a reset should be reported')
+    except RemotebitException:
+        pass
+    set_raise(False)
+    check(display.get_pixel(0, 0) == 7, 'the state should be restored after a reset during a request')
+display.clear()
@@ -0,0 +1,26 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+from testing_utils import *
+
+from microbit import *
+from mb_rules import *
+
+# analog values are always below 1024, so the rule fires once
+rule = Rule((pin1.read_analog, '<', 1024), (display.set_pixel, 2, 2, 9), (display.set_pixel, 2, 2, 0))
+sleep(50)
+check(rule.is_enabled(), 'rule should be enabled')
+check(rule.get_counts() == (1, 0), 'rule should fire once')
+check(display.get_pixel(2, 2) == 9, 'rule action should set the pixel')
+check(rule.get_error() == '', 'rule should not fail')
+
+rule.disable()
+check(not rule.is_enabled(), 'rule should be disabled')
+rule.enable()
+rule.remove()
+
+mirror = Rule((button_a.is_pressed, '==', True), (pin2.write_digital, 1), (pin2.write_digital, 0))
+sleep(50)
+check(mirror.get_counts() == (0, 0), 'button A should not be pressed')
+mirror.remove()
+display.clear()
@@ -7,8 +7,12 @@ from microbit import *
 import speech
 
 speech.say('hello world')
+speech.say('hello world')   # uses the cached translation
 
 p = speech.translate('hello world')
 check (p != '', 'wrong pronounce')
 speech.pronounce(p)
 speech.sing(p)
+
+# streamed while said
+speech.say('The quick brown fox jumps over the lazy dog. ' * 4)
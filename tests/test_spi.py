@@ -4,3 +4,13 @@
 from testing_utils import *
 
 from microbit import *
+
+spi.init()
+spi.write(b'\x01\x02\x03')
+b = spi.read(4)
+check(len(b) == 4, 'spi.read should return the requested number of bytes')
+
+out_buf = bytes(range(200))     # longer than a single request
+in_buf = bytearray(len(out_buf))
+spi.write_readinto(out_buf, in_buf)
+spi.write_readinto(out_buf[:8], memoryview(in_buf)[:8])
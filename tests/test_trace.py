@@ -0,0 +1,46 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+from testing_utils import *
+
+from microbit import *
+from mb_trace import *
+import tempfile
+
+records = []
+add_trace_hook(records.append)
+display.set_pixel(2, 2, 5)
+remove_trace_hook(records.append)
+# the first request may be preceded by the handshake with the micro:bit
+requests = [r for r in records if r.kind == 'request']
+check(requests, 'request should be traced')
+check(requests and requests[-1].command == 'display.set_pixel', 'wrong traced command')
+
+trace_path = tempfile.gettempdir() + '/test_trace.bin'
+with TraceFileSink(trace_path):
+    display.clear()
+    v = pin0.read_analog()
+replayed = list(read_trace_file(trace_path))
+check(replayed and replayed[0].command == 'display.clear', 'wrong record in the trace file')
+
+# a recorded session is replayed without the micro:bit
+import microbit as _microbit
+link = _microbit._mb_link
+record_path = tempfile.gettempdir() + '/test_record.rec'
+with open(record_path, 'wb') as f:
+    f.write(_microbit._MB_RECORD_MAGIC)
+    _microbit._mb_link = _microbit.RecordingLink(link, f)
+    display.set_pixel(1, 1, 7)
+    recorded = (display.get_pixel(1, 1), temperature())
+_microbit._mb_link = _microbit.ReplayLink(record_path)
+display.set_pixel(1, 1, 7)
+check((display.get_pixel(1, 1), temperature()) == recorded, 'the replayed replies should match the recorded ones')
+set_raise(True)
+try:
+    display.clear()
+    check(False, 'a request not recorded should be reported')
+except RemotebitException:
+    pass
+set_raise(False)
+_microbit._mb_link = link
+display.clear()
@@ -10,3 +10,19 @@ t1 = ticks_ms()
 sleep_ms(1000)
 t2 = ticks_ms()
 check(ticks_diff(t2, t1) - 1000 < 10, 'sleep_ms deviation should be small')
+
+set_write_coalescing(True, max_delay=1)
+display.set_pixel(0, 0, 5)
+sleep_ms(10)
+check(not get_mb_link().unconfirmed, 'coalesced writes should be sent at sleep_ms')
+display.set_pixel(0, 0, 0)
+sleep_us(10)
+check(not get_mb_link().unconfirmed, 'coalesced writes should be sent at sleep_us')
+set_write_coalescing(False)
+
+set_clock_sync(True)
+t1 = ticks_ms()
+rt = running_time()
+check(get_clock_error() < 50, 'clock sync error bound should be small')
+check(abs(rt - t1) < 50, 'running_time and ticks_ms should use the same clock')
+set_clock_sync(False)
@@ -0,0 +1,41 @@
+# SPDX-License-Identifier: MIT
+# Copyright (c) 2021 Volodymyr Turanskyy
+
+from testing_utils import *
+
+from microbit import *
+from mb_watch import *
+
+pin1.write_digital(0)
+watch = PinWatch(pin1)
+sleep(50)
+watch.read()
+for value in [1, 0, 1]:
+    pin1.write_digital(value)
+    sleep(50)
+watch.read()
+check(watch.value == 1, 'pin 1 should be high')
+check(watch.rising == 2, f'2 rising edges expected, counted {watch.rising}')
+check(watch.falling == 1, f'1 falling edge expected, counted {watch.falling}')
+check(watch.high_us > 0 and watch.low_us > 0, 'the pulses should be measured')
+check(watch.frequency() > 0, 'the frequency should be measured')
+watch.stop()
+
+# the edge callbacks calling the micro:bit
+edges = []
+def on_edge(value: int, ticks_us: int) -> None:
+    edges.append(value)
+    display.set_pixel(0, 0, 9 if value else 0)
+
+set_event_mode(True)
+pin2.write_digital(0)
+watch = PinWatch(pin2, on_edge)
+for value in [1, 0]:
+    pin2.write_digital(value)
+    # the edge is pushed while the reply is read
+    pin2.read_analog()
+check(edges == [1, 0], f'the edges should be reported, got {edges}')
+check(display.get_pixel(0, 0) == 0, 'the edge callback should call the micro:bit')
+watch.stop()
+set_event_mode(False)
+display.clear()